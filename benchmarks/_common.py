@@ -0,0 +1,50 @@
+'''
+Shared helpers for the benchmark scripts. Run the scripts from the repository
+root, e.g. `python benchmarks/parse.py`
+'''
+import os
+import sys
+import timeit
+from io import BytesIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# in the dev environment, mydy is known as src
+import src as mydy  # noqa: E402
+
+
+def fixture(name):
+    '''Return the path of a MIDI file shipped at the repository root'''
+    return os.path.join(ROOT, name)
+
+
+def scaled_pattern(name, factor):
+    '''
+    Read a MIDI file and repeat the events of each track factor times, keeping
+    a single EndOfTrackEvent at the end of each track.
+    '''
+    pattern = mydy.FileIO.read_midifile(fixture(name))
+    tracks = []
+    for track in pattern:
+        body = [event for event in track
+                if not isinstance(event, mydy.Events.EndOfTrackEvent)]
+        scaled = mydy.Containers.Track()
+        scaled.extend(event.copy() for _ in range(factor) for event in body)
+        scaled.append(mydy.Events.EndOfTrackEvent(tick=1))
+        tracks.append(scaled)
+    return mydy.Containers.Pattern(tracks=tracks,
+                                   resolution=pattern.resolution,
+                                   fmt=pattern.format)
+
+
+def encode(pattern):
+    '''Return the bytes of pattern written as a MIDI file'''
+    buf = BytesIO()
+    mydy.FileIO.FileWriter().write(buf, pattern)
+    return buf.getvalue()
+
+
+def best_of(func, repeat=5, number=1):
+    '''Return the best wall-clock time of func in seconds'''
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
@@ -0,0 +1,28 @@
+'''
+Time Track and ArrayTrack operators on a scaled-up copy of mary.mid
+'''
+from _common import mydy, scaled_pattern, best_of
+
+
+def main():
+    track = scaled_pattern('mary.mid', 2000)[1]
+    arrays = mydy.Arrays.ArrayTrack.from_track(track)
+    print('%d events' % len(track))
+    for name, op in [('transpose', lambda x: x + 2),
+                     ('velocity', lambda x: x >> 10),
+                     ('stretch', lambda x: x * 1.5),
+                     ('repeat', lambda x: x ** 3),
+                     ('merge', lambda x: x.merge(x >> 1)),
+                     ('map', lambda x: x.map(lambda e: 100, 'velocity',
+                                             mydy.Events.NoteOnEvent)),
+                     ('filter', lambda x: x.filter(
+                         lambda e: e.status == 0x90)),
+                     ('slice', lambda x: x[1000:-1000])]:
+        objects = best_of(lambda: op(track), repeat=3)
+        columns = best_of(lambda: op(arrays), repeat=3)
+        print('  %-10s Track %7.3fs  ArrayTrack %7.3fs  (%.1fx)' %
+              (name, objects, columns, objects / columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+'''
+Bar lookups through a BarGrid with a time signature change every 4 bars of a
+mary.mid x200 track, and slicing the pattern into 8-bar sections
+'''
+import random
+from _common import mydy, scaled_pattern, best_of
+
+
+def main():
+    pattern = scaled_pattern('mary.mid', 200)
+    changes = []
+    tick = 0
+    for _ in range(1000):
+        numerator = random.choice([2, 3, 4, 5])
+        changes.append(mydy.Events.TimeSignatureEvent(
+            tick=tick, data=bytes([numerator, 2, 24, 8])))
+        # ticks are relative: the next change comes 4 bars later
+        tick = 4 * numerator * pattern.resolution
+    pattern[0][0:0] = changes
+    grid = pattern.bar_grid
+    length = max(t.length for t in pattern)
+    queries = [random.randrange(length) for _ in range(10000)]
+    seconds = best_of(lambda: [grid.tick_to_bar(t) for t in queries],
+                      repeat=3)
+    print('%d meters: tick_to_bar %10.0f lookups/sec' %
+          (len(grid), len(queries) / seconds))
+    bars = grid.tick_to_bar(length)[0]
+    seconds = best_of(lambda: [pattern.slice_bars(bar, bar + 8)
+                               for bar in range(0, bars, 8)], repeat=3)
+    print('slice_bars: %d sections of 8 bars in %.1f ms' %
+          (-(-bars // 8), seconds * 1e3))
+
+
+if __name__ == '__main__':
+    main()
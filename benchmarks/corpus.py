@@ -0,0 +1,40 @@
+'''
+Files/sec of read_corpus over a directory of scaled-up copies of mary.mid,
+for increasing numbers of worker processes
+'''
+import os
+import shutil
+import tempfile
+import time
+from _common import mydy, scaled_pattern, encode
+
+
+def main():
+    data = encode(scaled_pattern('mary.mid', 100))
+    directory = tempfile.mkdtemp()
+    try:
+        paths = []
+        for i in range(200):
+            paths.append(os.path.join(directory, '%d.mid' % i))
+            with open(paths[-1], 'wb') as f:
+                f.write(data)
+        start = time.perf_counter()
+        for path in paths:
+            mydy.FileIO.read_midifile(path)
+        serial = time.perf_counter() - start
+        print('serial loop  %7.1f files/sec' % (len(paths) / serial))
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            for result in mydy.Corpus.read_corpus(paths, workers=workers):
+                assert result.error is None, result.error
+            seconds = time.perf_counter() - start
+            print('workers=%-4d %7.1f files/sec' % (workers,
+                                                   len(paths) / seconds))
+            workers *= 2
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
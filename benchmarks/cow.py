@@ -0,0 +1,44 @@
+'''
+Time and peak memory, measured with tracemalloc, of chained transforms (eager
+and fused), copies and slices of a Pattern read from a scaled-up copy of mary.mid
+'''
+import tracemalloc
+from io import BytesIO
+from _common import mydy, scaled_pattern, encode, best_of
+
+
+def measure(name, func):
+    seconds = best_of(func, repeat=3)
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print('%-22s %8.1f ms %8.1f MB peak' % (name, seconds * 1e3, peak / 1e6))
+
+
+def main():
+    data = encode(scaled_pattern('mary.mid', 2000))
+    pattern = mydy.FileIO.CursorFileReader().read(BytesIO(data))
+    count = sum(len(track) for track in pattern)
+    print('%d events' % count)
+    measure('((p + 2) >> 10) * 1.5', lambda: ((pattern + 2) >> 10) * 1.5)
+    measure('  fused with p.lazy()',
+            lambda: (((pattern.lazy() + 2) >> 10) * 1.5).materialize())
+    measure('p.copy()', pattern.copy)
+    measure('p.copy().copy()', lambda: pattern.copy().copy())
+    for track in pattern:
+        for event in track:
+            pass
+    measure('p.copy() after a read', pattern.copy)
+
+    def retick():
+        for track in pattern:
+            for event in track:
+                event.tick = event.tick
+    measure('set every event.tick', retick)
+    measure('p[1][1000:-1000]', lambda: pattern[1][1000:-1000])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+'''
+Filtered reads against a full read with the cursor engine, on scaled-up
+copies of mary.mid and sotw.mid. Dropped events are stepped over by length,
+so a read gains in proportion to the events it drops
+'''
+from io import BytesIO
+from _common import mydy, scaled_pattern, encode, best_of
+
+Events = mydy.Events
+
+
+def main():
+    filters = [
+        ('notes', dict(include=(Events.NoteOnEvent, Events.NoteOffEvent))),
+        ('no metas', dict(exclude=Events.MetaEvent)),
+        ('no note offs', dict(exclude=Events.NoteOffEvent)),
+        ('metas', dict(include=Events.MetaEvent)),
+        ('tempos', dict(include=Events.SetTempoEvent)),
+    ]
+    reader = mydy.FileIO.CursorFileReader
+    for name, factor in [('mary.mid', 2000), ('sotw.mid', 5000)]:
+        data = encode(scaled_pattern(name, factor))
+        pattern = reader().read(BytesIO(data))
+        count = sum(len(track) for track in pattern)
+        full = best_of(lambda: reader().read(BytesIO(data)), repeat=3)
+        print('%s x%d: %d events, full read %.1f ms' %
+              (name, factor, count, full * 1e3))
+        for label, kwargs in filters:
+            filtered = reader(**kwargs)
+            kept = sum(len(track) for track in
+                       filtered.read(BytesIO(data)))
+            seconds = best_of(lambda: reader(**kwargs).read(BytesIO(data)),
+                              repeat=3)
+            print('  %-13s %3.0f%% kept %8.1f ms %6.2fx' %
+                  (label, 100 * kept / count, seconds * 1e3, full / seconds))
+
+
+if __name__ == '__main__':
+    main()
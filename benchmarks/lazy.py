@@ -0,0 +1,27 @@
+'''
+Time to read the name of the first track of a 40-track file, eagerly and
+with a lazy, memory-mapped read
+'''
+import os
+import tempfile
+from _common import mydy, scaled_pattern, encode, best_of
+
+
+def main():
+    track = scaled_pattern('mary.mid', 50)[1]
+    tracks = [mydy.Containers.Track([mydy.Events.TrackNameEvent(
+        text='Track %d' % i)]) + track for i in range(40)]
+    pattern = mydy.Containers.Pattern(tracks=tracks)
+    with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as f:
+        f.write(encode(pattern))
+    try:
+        for lazy in (False, True):
+            seconds = best_of(lambda: mydy.FileIO.read_midifile(
+                f.name, lazy=lazy)[0][0].text)
+            print('lazy=%-5s %8.2f ms' % (lazy, seconds * 1e3))
+    finally:
+        os.remove(f.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+'''
+Time to repeat the piano track of mary.mid with Track.__pow__, and to write
+the repetitions out from a lazy Track.loop(), for growing loop counts. Both
+should grow linearly with the number of events produced.
+'''
+from io import BytesIO
+from _common import mydy, fixture, best_of
+
+
+def main():
+    track = mydy.FileIO.read_midifile(fixture('mary.mid'))[1]
+    for factor in [10, 100, 1000, 10000]:
+        count = len(track ** factor)
+        seconds = best_of(lambda: track ** factor, repeat=3)
+        print('track ** %-6d %8d events %10.0f events/sec' %
+              (factor, count, count / seconds))
+        seconds = best_of(
+            lambda: mydy.FileIO.FileWriter().write_track(
+                BytesIO(), track.loop(factor)),
+            repeat=3)
+        print('  written from loop()       %10.0f events/sec' %
+              (count / seconds))
+
+
+if __name__ == '__main__':
+    main()
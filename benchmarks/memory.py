@@ -0,0 +1,28 @@
+'''
+Memory held by a Pattern read from a scaled-up copy of mary.mid, measured
+with tracemalloc, before and after interning its events with freeze()
+'''
+import tracemalloc
+from io import BytesIO
+from _common import mydy, scaled_pattern, encode
+
+
+def main():
+    data = encode(scaled_pattern('mary.mid', 2000))
+    tracemalloc.start()
+    pattern = mydy.FileIO.CursorFileReader().read(BytesIO(data))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = sum(len(track) for track in pattern)
+    print('%d events: %.1f MB held (%.0f bytes/event), %.1f MB peak' %
+          (count, current / 1e6, current / count, peak / 1e6))
+    tracemalloc.start()
+    pattern = mydy.FileIO.CursorFileReader().read(BytesIO(data)).freeze()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('frozen: %.1f MB held (%.0f bytes/event), %.1f MB peak' %
+          (current / 1e6, current / count, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
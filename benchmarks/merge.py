@@ -0,0 +1,25 @@
+'''
+Time to flatten a 64-track pattern, built from shifted copies of the piano
+track of mary.mid, with one k-way Pattern.flatten() and with pairwise
+Track.merge calls
+'''
+from functools import reduce
+from _common import mydy, scaled_pattern, best_of
+
+
+def main():
+    track = scaled_pattern('mary.mid', 20)[1]
+    tracks = [track >> 0 for _ in range(64)]
+    for i, copy in enumerate(tracks):
+        copy[0].tick += i
+    pattern = mydy.Containers.Pattern(tracks)
+    count = sum(len(track) for track in pattern)
+    seconds = best_of(pattern.flatten, repeat=3)
+    print('flatten()       %8d events %8.1f ms' % (count, seconds * 1e3))
+    seconds = best_of(lambda: reduce(mydy.Containers.Track.merge, pattern),
+                      repeat=1)
+    print('pairwise merge  %8d events %8.1f ms' % (count, seconds * 1e3))
+
+
+if __name__ == '__main__':
+    main()
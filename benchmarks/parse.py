@@ -0,0 +1,33 @@
+'''
+Events/sec of the iterator and cursor parsing engines, of columnar decoding,
+of the metadata scan and of a notes-only filtered read, on scaled-up copies
+of mary.mid and sotw.mid
+'''
+from io import BytesIO
+from _common import mydy, scaled_pattern, encode, best_of
+
+
+def main():
+    for name, factor in [('mary.mid', 2000), ('sotw.mid', 5000)]:
+        data = encode(scaled_pattern(name, factor))
+        count = sum(len(track) for track in
+                    mydy.FileIO.FileReader().read(BytesIO(data)))
+        print('%s x%d: %d events, %d bytes' % (name, factor, count, len(data)))
+        for engine, reader in sorted(mydy.FileIO.READERS.items()):
+            seconds = best_of(lambda: reader().read(BytesIO(data)), repeat=3)
+            print('  %-8s %10.0f events/sec' % (engine, count / seconds))
+        reader = mydy.FileIO.ArrayFileReader
+        seconds = best_of(lambda: reader().read(BytesIO(data)), repeat=3)
+        print('  %-8s %10.0f events/sec' % ('columnar', count / seconds))
+        reader = mydy.FileIO.ScanFileReader
+        seconds = best_of(lambda: reader().read(BytesIO(data)), repeat=3)
+        print('  %-8s %10.0f events/sec' % ('scan', count / seconds))
+        notes = (mydy.Events.NoteOnEvent, mydy.Events.NoteOffEvent)
+        reader = mydy.FileIO.CursorFileReader
+        seconds = best_of(lambda: reader(include=notes).read(BytesIO(data)),
+                          repeat=3)
+        print('  %-8s %10.0f events/sec' % ('notes', count / seconds))
+
+
+if __name__ == '__main__':
+    main()
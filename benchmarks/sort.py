@@ -0,0 +1,24 @@
+'''
+Time to put the shuffled events of an absolute mary.mid x200 track in
+canonical order, comparing events with __lt__ and with the bulk Track.sort()
+'''
+import random
+from _common import mydy, scaled_pattern, best_of
+
+
+def main():
+    track = scaled_pattern('mary.mid', 200)[1].make_ticks_abs()
+    events = list(track)
+    random.seed(0)
+    random.shuffle(events)
+    track = mydy.Containers.Track(events, relative=False)
+    seconds = best_of(lambda: sorted(events), repeat=3)
+    print('sorted(events)  %8d events %8.1f ms' %
+          (len(events), seconds * 1e3))
+    seconds = best_of(lambda: track.copy().sort(), repeat=3)
+    print('Track.sort()    %8d events %8.1f ms' %
+          (len(events), seconds * 1e3))
+
+
+if __name__ == '__main__':
+    main()
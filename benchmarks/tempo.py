@@ -0,0 +1,28 @@
+'''
+Tick to seconds conversions through a TempoMap with a tempo change every
+quarter note of a mary.mid x200 track: scalar lookups, and a whole track's
+ticks converted at once
+'''
+import random
+from _common import mydy, scaled_pattern, best_of
+
+
+def main():
+    pattern = scaled_pattern('mary.mid', 200)
+    track = pattern[1]
+    ticks = track.abs_ticks
+    tempos = [(tick, random.randint(300000, 700000))
+              for tick in range(0, track.length, pattern.resolution)]
+    tempo_map = mydy.Tempo.TempoMap(tempos, pattern.resolution)
+    queries = [random.randrange(track.length) for _ in range(10000)]
+    seconds = best_of(lambda: [tempo_map.seconds(t) for t in queries],
+                      repeat=3)
+    print('%d segments: seconds(tick) %10.0f lookups/sec' %
+          (len(tempo_map), len(queries) / seconds))
+    seconds = best_of(lambda: tempo_map.to_seconds(ticks), repeat=3)
+    print('to_seconds(abs_ticks) %8d ticks %10.0f ticks/sec' %
+          (len(ticks), len(ticks) / seconds))
+
+
+if __name__ == '__main__':
+    main()
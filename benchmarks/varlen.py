@@ -0,0 +1,47 @@
+'''
+Microbenchmark of the variable-length-quantity codec, on delta ticks drawn
+mostly from the one and two byte range, as in real tracks
+'''
+import random
+from _common import mydy, best_of
+
+Util = mydy.Util
+
+
+def main():
+    random.seed(0)
+    values = [random.choice([random.randint(0, 0x7F),
+                             random.randint(0x80, 0x3FFF),
+                             random.randint(0x4000, 0xFFFFFFF)])
+              for _ in range(100000)]
+    encoded = Util.write_varlens(values)
+    cases = [
+        ('write_varlen', lambda: [Util.write_varlen(v) for v in values]),
+        ('_encode_varlen', lambda: [Util._encode_varlen(v) for v in values]),
+        ('write_varlens', lambda: Util.write_varlens(values)),
+        ('read_varlen', lambda: read_each(encoded, len(values))),
+        ('read_varlen_at', lambda: read_each_at(encoded, len(values))),
+        ('read_varlens', lambda: Util.read_varlens(encoded)),
+    ]
+    print('%d values, %d bytes' % (len(values), len(encoded)))
+    for name, func in cases:
+        seconds = best_of(func, repeat=3)
+        print('  %-15s %10.0f values/sec' % (name, len(values) / seconds))
+
+
+def read_each(encoded, count):
+    byte_iter = iter(encoded)
+    return [Util.read_varlen(byte_iter) for _ in range(count)]
+
+
+def read_each_at(encoded, count):
+    values = []
+    offset = 0
+    for _ in range(count):
+        value, offset = Util.read_varlen_at(encoded, offset)
+        values.append(value)
+    return values
+
+
+if __name__ == '__main__':
+    main()
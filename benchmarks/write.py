@@ -0,0 +1,21 @@
+'''
+Events/sec of FileWriter on growing copies of sotw.mid. Throughput should stay
+flat as tracks grow, since tracks are encoded into a single buffer.
+'''
+from io import BytesIO
+from _common import mydy, scaled_pattern, best_of
+
+
+def main():
+    for factor in [500, 5000, 50000]:
+        pattern = scaled_pattern('sotw.mid', factor)
+        count = sum(len(track) for track in pattern)
+        seconds = best_of(
+            lambda: mydy.FileIO.FileWriter().write(BytesIO(), pattern),
+            repeat=3)
+        print('sotw.mid x%-6d %8d events %10.0f events/sec' %
+              (factor, count, count / seconds))
+
+
+if __name__ == '__main__':
+    main()
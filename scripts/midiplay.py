@@ -28,12 +28,13 @@ if not port.isdigit:
 seq = sequencer.SequencerWrite(sequencer_resolution=pattern.resolution)
 seq.subscribe_port(client, port)
 
-pattern.make_ticks_abs()
+pattern.relative = False
 events = []
 for track in pattern:
     for event in track:
         events.append(event)
-events.sort()
+# canonical order: meta events, then note offs before note ons at each tick
+events.sort(key=lambda event: event.sort_key)
 seq.start_sequencer()
 for event in events:
     buf = seq.event_write(event, False, False, True)
@@ -12,7 +12,7 @@ __base__ = {
     'author': 'James Wenzel',
     'author_email': 'jameswenzel@berkeley.edu',
     'package_dir': {'mydy': 'src'},
-    'py_modules': ['mydy.Containers', 'mydy.__init__', 'mydy.Events', 'mydy.Util', 'mydy.FileIO', 'mydy.Constants'],
+    'py_modules': ['mydy.Containers', 'mydy.__init__', 'mydy.Events', 'mydy.Util', 'mydy.FileIO', 'mydy.Constants', 'mydy.Arrays', 'mydy.Corpus', 'mydy.Tempo'],
     'ext_modules': [],
     'ext_package': '',
     'scripts': ['scripts/mididump.py', 'scripts/mididumphw.py', 'scripts/midiplay.py'],
@@ -0,0 +1,568 @@
+'''
+Struct-of-arrays containers that hold a track's events as parallel columns
+instead of Event objects
+
+Every column is an array.array, so it exposes the buffer protocol and can be
+wrapped without copying, e.g. with numpy.frombuffer. ArrayTrack and
+ArrayPattern support the same operators as Track and Pattern. Without numpy,
+these are not vectorized: they loop over columns in Python, through map,
+bytes.translate and array slicing, rather than over Event objects. That makes
+transposing, shifting, scaling, repeating and merging faster than on a Track
+(see benchmarks/arrays.py). map and filter still build an Event object for
+every row they pass to their function, and are slower than on a Track.
+
+Unlike Track, ticks are always whole numbers: multiplying or dividing an
+ArrayTrack scales its absolute ticks and rounds them, so no drift accumulates.
+Data bytes are kept in the MIDI range, 0-127: values out of it are clamped,
+as FileWriter does when it writes the events of a Track.
+'''
+from array import array
+from itertools import accumulate, chain, compress
+from operator import sub
+from .Containers import Track, Pattern, _events
+from .Events import (EventRegistry, MetaEvent, SysexEvent, UnknownMetaEvent,
+                     EndOfTrackEvent, NoteOnEvent, NoteOffEvent,
+                     PitchWheelEvent, _restore_event)
+
+# column name -> array typecode
+COLUMNS = (
+    ('tick', 'q'),      # relative tick
+    ('abstick', 'q'),   # absolute tick
+    ('status', 'B'),    # 0x80-0xE0 for channel events, 0xF0 sysex, 0xFF meta
+    ('channel', 'B'),
+    ('data1', 'B'),     # first data byte, or the metacommand of meta events
+    ('data2', 'B'),     # second data byte
+    ('offset', 'q'),    # start of sysex/meta data in the payload buffer
+    ('size', 'q'),      # size of sysex/meta data in the payload buffer
+)
+
+
+def _statuses_with(attr):
+    '''Statuses of registered channel events that have the given attribute'''
+    return frozenset(status for status, cls in EventRegistry.Events.items()
+                     if hasattr(cls, attr))
+
+
+def _diff(absticks):
+    '''Relative ticks from absolute ticks'''
+    return array('q', map(sub, absticks, chain((0,), absticks)))
+
+
+def _rows(statuses):
+    '''Table translating a status column into a mask of 0xFF per row whose
+    status is in statuses, else 0'''
+    return bytes(0xFF if status in statuses else 0 for status in range(0x100))
+
+
+def _shifted(column, selected, o):
+    '''
+    Return a copy of a data column with o added to the rows selected by a
+    mask from _rows, clamped to 0-127 as FileWriter quantizes data bytes
+    '''
+    if not o:
+        return column[:]
+    data = column.tobytes()
+    shifted = data.translate(bytes(min(max(value + o, 0), 127)
+                                   for value in range(0x100)))
+    # take the selected bytes from shifted, the others from data, bitwise
+    # over the whole column at once
+    unchanged = int.from_bytes(data, 'little')
+    merged = unchanged ^ ((unchanged ^ int.from_bytes(shifted, 'little')) &
+                          int.from_bytes(selected, 'little'))
+    return array('B', merged.to_bytes(len(data), 'little'))
+
+
+class ArrayTrack(object):
+    '''
+    Track whose events are stored column-wise. Meta and sysex data live in a
+    payload buffer that may be shared with the other tracks of an ArrayPattern.
+    The buffer is append-only: data is added at its end, and bytes already in
+    it are never changed, so the offsets of every track sharing it stay valid.
+    '''
+
+    def __init__(self, payload=None, relative=True):
+        '''
+        Params:
+            Optional:
+            payload: bytearray - buffer holding meta and sysex data
+            relative: bool - whether events produced by the track carry
+                relative or absolute ticks
+        '''
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+        self.payload = bytearray() if payload is None else payload
+        self.relative = relative
+
+    @classmethod
+    def from_track(cls, track, payload=None):
+        '''Build an ArrayTrack from a Track of Event objects'''
+        new = cls(payload=payload, relative=track.relative)
+        # round absolute ticks, so float ticks don't drift
+        if track.relative:
+            absticks = accumulate(event.tick for event in _events(track))
+        else:
+            absticks = (event.tick for event in _events(track))
+        for abstick, event in zip(absticks, _events(track)):
+            new.append_event(event, int(abstick + .5))
+        new.tick = _diff(new.abstick)
+        return new
+
+    def append_event(self, event, abstick):
+        '''
+        Append an Event object to the columns at the given absolute tick.
+        The tick column is left for the caller to recompute.
+        '''
+        self._append(0, abstick, *self._event_row(event))
+
+    def _event_row(self, event):
+        '''
+        Return the status, channel, data1, data2, offset and size columns of
+        an Event object, appending its meta or sysex data to the payload
+        '''
+        status = event.status
+        if status == MetaEvent.status or status == SysexEvent.status:
+            data1 = event.metacommand if status == MetaEvent.status else 0
+            data = bytes(event._data)
+            offset = len(self.payload)
+            self.payload += data
+            return status, 0, data1, 0, offset, len(data)
+        data = event._data
+        # quantize data bytes to 7-bit values, as Event.write_to
+        data1 = min(max(int(data[0]), 0), 127) if len(data) else 0
+        data2 = min(max(int(data[1]), 0), 127) if len(data) > 1 else 0
+        return status, event.channel, data1, data2, 0, 0
+
+    def append_row(self, tick, status, channel=0, data1=0, data2=0, offset=0,
+                   size=0):
+        '''Append one event to the columns, given its relative tick'''
+        self._append(tick, (self.abstick[-1] if len(self.abstick) else 0)
+                     + tick, status, channel, data1, data2, offset, size)
+
+    def _append(self, tick, abstick, status, channel, data1, data2, offset,
+                size):
+        self.tick.append(tick)
+        self.abstick.append(abstick)
+        self.status.append(status)
+        self.channel.append(channel)
+        self.data1.append(data1)
+        self.data2.append(data2)
+        self.offset.append(offset)
+        self.size.append(size)
+
+    @property
+    def columns(self):
+        '''Dictionary of column name to array'''
+        return {name: getattr(self, name) for name, _ in COLUMNS}
+
+    @property
+    def length(self):
+        '''Compute the length of a track in ticks'''
+        return self.abstick[-1] if len(self) else 0
+
+    def event(self, i):
+        '''Construct the Event object for row i'''
+        # the columns hold valid data bytes, so the constructors are bypassed
+        tick = self.tick[i] if self.relative else self.abstick[i]
+        status = self.status[i]
+        if status == MetaEvent.status:
+            metacommand = self.data1[i]
+            cls = EventRegistry.MetaEvents.get(metacommand, UnknownMetaEvent)
+            return _restore_event(cls, tick, self._payload(i),
+                                  None if metacommand == cls.metacommand
+                                  else metacommand)
+        elif status == SysexEvent.status:
+            return _restore_event(SysexEvent, tick, self._payload(i), None)
+        cls = EventRegistry.Events[status]
+        return _restore_event(cls, tick,
+                              bytes((self.data1[i], self.data2[i])[:cls.length]),
+                              self.channel[i])
+
+    def event_class(self, i):
+        '''Return the Event class of row i without constructing it'''
+        status = self.status[i]
+        if status == MetaEvent.status:
+            return EventRegistry.MetaEvents.get(self.data1[i],
+                                                UnknownMetaEvent)
+        return EventRegistry.Events[status]
+
+    def _payload(self, i):
+        start = self.offset[i]
+        return bytes(self.payload[start:start + self.size[i]])
+
+    def to_track(self, relative=None):
+        '''Convert to a Track of Event objects'''
+        copy = self.copy()
+        if relative is not None:
+            copy.relative = relative
+        return Track._wrap(copy, copy.relative)
+
+    def copy(self):
+        '''Copy the columns. The append-only payload buffer is shared'''
+        new = ArrayTrack(payload=self.payload, relative=self.relative)
+        for name, column in self.columns.items():
+            setattr(new, name, column[:])
+        return new
+
+    def take(self, indices):
+        '''Return a new ArrayTrack made of the rows at indices, in order'''
+        indices = list(indices)
+        new = ArrayTrack(payload=self.payload, relative=self.relative)
+        for name, column in self.columns.items():
+            setattr(new, name, array(column.typecode,
+                                     map(column.__getitem__, indices)))
+        new.abstick = array('q', accumulate(new.tick))
+        return new
+
+    def _rebased(self, payload):
+        '''Return a copy whose payload lives in, and is appended to, payload'''
+        if payload is self.payload:
+            return self.copy()
+        new = self.copy()
+        new.payload = payload
+        for i, size in enumerate(self.size):
+            if size:
+                start = self.offset[i]
+                new.offset[i] = len(payload)
+                payload += self.payload[start:start + size]
+        return new
+
+    def _extend(self, other):
+        '''Append the rows of another ArrayTrack sharing this payload'''
+        for name, column in self.columns.items():
+            column.extend(getattr(other, name))
+
+    def _is_end_of_track(self, i):
+        return (self.status[i] == MetaEvent.status and
+                self.data1[i] == EndOfTrackEvent.metacommand)
+
+    def merge(self, o):
+        '''Merge two ArrayTracks, interleaving their rows by absolute tick.'''
+        assert isinstance(o, ArrayTrack), "Can only merge with other tracks"
+        combined = self.copy()
+        combined._extend(o._rebased(self.payload))
+        abstick = combined.abstick
+        order = sorted(range(len(combined)), key=abstick.__getitem__)
+        for name, column in combined.columns.items():
+            setattr(combined, name,
+                    array(column.typecode, map(column.__getitem__, order)))
+        combined.tick = _diff(combined.abstick)
+        return combined
+
+    def map(self, f, attr=None, event_type=None):
+        '''
+        Map a function that operates on events over the track, as Track.map.
+        Only rows of event_type are turned into Event objects.
+        Returns:
+            A new ArrayTrack with f applied to all matching events
+        '''
+        new = self.copy()
+        ticks = list(self.tick if self.relative else self.abstick)
+        status, data1 = self.status, self.data1
+        matches = {}
+        for i in range(len(self)):
+            # whether rows match event_type only depends on their class
+            key = (status[i], data1[i] if status[i] == MetaEvent.status
+                   else None)
+            match = matches.get(key)
+            if match is None:
+                match = matches[key] = (
+                    event_type is None or
+                    issubclass(self.event_class(i), event_type))
+            if not match:
+                continue
+            event = self.event(i)
+            if attr is None:
+                event = f(event)
+            elif hasattr(event, attr):
+                setattr(event, attr, f(event))
+            ticks[i] = event.tick
+            (new.status[i], new.channel[i], new.data1[i], new.data2[i],
+             new.offset[i], new.size[i]) = new._event_row(event)
+        if self.relative:
+            ticks = accumulate(ticks)
+        new.abstick = array('q', (int(tick + .5) for tick in ticks))
+        new.tick = _diff(new.abstick)
+        return new
+
+    def filter(self, test):
+        '''Filter rows according to a test predicate on their events.
+        Returns a new ArrayTrack with only rows that satisfy the test.'''
+        return self.take(i for i in range(len(self)) if test(self.event(i)))
+
+    def __len__(self):
+        return len(self.tick)
+
+    def __iter__(self):
+        return (self.event(i) for i in range(len(self)))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            new = ArrayTrack(payload=self.payload, relative=self.relative)
+            for name, column in self.columns.items():
+                setattr(new, name, column[item])
+            new.abstick = array('q', accumulate(new.tick))
+            return new
+        return self.event(item if item >= 0 else len(self) + item)
+
+    def __repr__(self):
+        return "mydy.ArrayTrack(relative: %s, events=%d)" % (self.relative,
+                                                             len(self))
+
+    def __eq__(self, o):
+        if not isinstance(o, ArrayTrack):
+            return NotImplemented
+        return (self.relative == o.relative and
+                self.tick == o.tick and self.status == o.status and
+                self.channel == o.channel and self.data1 == o.data1 and
+                self.data2 == o.data2 and self.size == o.size and
+                all(self._payload(i) == o._payload(i)
+                    for i in range(len(self)) if self.size[i]))
+
+    def __ne__(self, o):
+        return not self == o
+
+    def __add__(self, o):
+        if isinstance(o, int):
+            pitched = _statuses_with('pitch') - {PitchWheelEvent.status}
+            statuses = self.status.tobytes()
+            new = self.copy()
+            new.data1 = _shifted(self.data1,
+                                 statuses.translate(_rows(pitched)), o)
+            # the wheel's 14 bit value wraps around, as PitchWheelEvent.pitch
+            wheels = statuses.translate(_rows({PitchWheelEvent.status}))
+            for i in compress(range(len(self)), wheels):
+                value = ((self.data2[i] << 7) | self.data1[i]) + o
+                new.data1[i] = value & 0x7F
+                new.data2[i] = (value >> 7) & 0x7F
+            return new
+        elif isinstance(o, ArrayTrack):
+            if len(self) and self._is_end_of_track(len(self) - 1):
+                # slice out the end-of-track event, nudging o by its tick
+                eot = len(self) - 1
+                new = self.take(range(eot))
+                if len(o):
+                    ocopy = o._rebased(new.payload)
+                    ocopy.tick[0] += self.tick[eot]
+                else:
+                    ocopy = self.take([eot])
+            else:
+                new = self.copy()
+                ocopy = o._rebased(new.payload)
+            new._extend(ocopy)
+            new.abstick = array('q', accumulate(new.tick))
+            return new
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __sub__(self, o):
+        if isinstance(o, int):
+            return self + (-o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __rshift__(self, o):
+        if isinstance(o, int):
+            velocity = _statuses_with('velocity')
+            new = self.copy()
+            new.data2 = _shifted(
+                self.data2, self.status.tobytes().translate(_rows(velocity)),
+                o)
+            return new
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __lshift__(self, o):
+        if isinstance(o, int):
+            return self >> (-o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __mul__(self, o):
+        if o <= 0:
+            raise TypeError(f"multiplication factor must be greater than zero")
+        elif (isinstance(o, int) or isinstance(o, float)) and o > 0:
+            if len(self) and max(self.abstick) * o >= 2 ** 63:
+                raise ValueError('scaling by %r takes ticks past the range '
+                                 'of the tick columns' % o)
+            new = self.copy()
+            if isinstance(o, int):
+                scaled = map(o.__mul__, self.abstick)
+            else:
+                # round half up, as int(tick * o + .5)
+                scaled = map(int, map((.5).__add__,
+                                      map(o.__mul__, self.abstick)))
+            new.abstick = array('q', scaled)
+            new.tick = _diff(new.abstick)
+            return new
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __truediv__(self, o):
+        if o <= 0:
+            raise TypeError(f"multiplication factor must be greater than zero")
+        elif (isinstance(o, int) or isinstance(o, float)) and o > 0:
+            return self * (1 / o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __pow__(self, o):
+        assert 0 < o, "Extension power must be greater than zero"
+        if not (isinstance(o, int) or isinstance(o, float)):
+            raise TypeError(
+                f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+        length = self.length
+        # grab the end-of-track-event
+        end = len(self)
+        end_of_track = None
+        if end and self._is_end_of_track(end - 1):
+            end -= 1
+            end_of_track = end
+        # the rows repeated after the first copy of the track
+        keep = self.status[:end].tobytes().translate(
+            _rows(set(range(0x100)) - {MetaEvent.status}))
+        body = ArrayTrack(payload=self.payload, relative=self.relative)
+        for name, column in self.columns.items():
+            setattr(body, name, array(column.typecode,
+                                      compress(column[:end], keep)))
+        partial = 0
+        # decide if we're extending by a partial factor, add fraction to the end
+        note_offs = []
+        cutoff = length * (o % 1)
+        if cutoff:
+            # keep track of absolute tick position and which notes are on
+            pos = 0
+            on = set()
+            for n in range(len(body)):
+                pos += body.tick[n]
+                if pos > cutoff:
+                    tick = cutoff - (pos - body.tick[n])
+                    partial = n
+                    for note in on:
+                        note_offs.append((tick, note))
+                        # since these are relative ticks, set to 0
+                        tick = 0
+                    break
+                if body.status[n] == NoteOnEvent.status:
+                    on.add(body.data1[n])
+                elif body.status[n] == NoteOffEvent.status:
+                    on.discard(body.data1[n])
+        # repeat whole columns by array slicing and repetition
+        new = ArrayTrack(payload=self.payload, relative=self.relative)
+        for name, column in self.columns.items():
+            repeated = getattr(body, name)
+            setattr(new, name, column[:end] + repeated * (int(o) - 1)
+                    + repeated[:partial])
+        new.abstick = array('q', accumulate(new.tick))
+        for tick, note in note_offs:
+            new.append_row(int(tick + .5), NoteOffEvent.status, 0, note, 0)
+        if end_of_track is not None:
+            new._extend(self.take([end_of_track]))
+            new.abstick = array('q', accumulate(new.tick))
+        return new
+
+
+class ArrayPattern(list):
+    '''
+    Pattern class to hold ArrayTracks, which share a single payload buffer
+    '''
+
+    def __init__(self, tracks=[], resolution=220, fmt=1, payload=None):
+        self.format = fmt
+        self.resolution = resolution
+        self.payload = bytearray() if payload is None else payload
+        super(ArrayPattern, self).__init__(
+            track._rebased(self.payload) for track in tracks)
+
+    @classmethod
+    def from_pattern(cls, pattern):
+        '''Build an ArrayPattern from a Pattern of Tracks'''
+        new = cls(resolution=pattern.resolution, fmt=pattern.format)
+        new.extend(ArrayTrack.from_track(track, new.payload)
+                   for track in pattern)
+        return new
+
+    def new_track(self):
+        '''Append and return an empty ArrayTrack sharing this payload buffer'''
+        track = ArrayTrack(payload=self.payload)
+        self.append(track)
+        return track
+
+    def to_pattern(self, relative=True):
+        '''Convert to a Pattern of Tracks of Event objects'''
+        pattern = Pattern(tracks=[Track(relative=relative) for _ in self],
+                          resolution=self.resolution, fmt=self.format,
+                          relative=relative)
+        for track, arrays in zip(pattern, self):
+            copy = arrays.copy()
+            copy.relative = relative
+            list.extend(track, copy)
+        return pattern
+
+    def copy(self):
+        return ArrayPattern(self, self.resolution, self.format)
+
+    def _map_tracks(self, f):
+        new = ArrayPattern(resolution=self.resolution, fmt=self.format,
+                           payload=self.payload)
+        new.extend(f(track) for track in self)
+        return new
+
+    def __repr__(self):
+        return "mydy.ArrayPattern(format=%r, resolution=%r, tracks=%r)" % \
+            (self.format, self.resolution, list(self))
+
+    def __eq__(self, o):
+        return (super(ArrayPattern, self).__eq__(o)
+                and self.resolution == o.resolution
+                and self.format == o.format)
+
+    def __ne__(self, o):
+        return not self == o
+
+    def __add__(self, o):
+        if isinstance(o, int):
+            return self._map_tracks(lambda x: x + o)
+        elif isinstance(o, ArrayPattern):
+            copy = self.copy()
+            copy.extend(track._rebased(copy.payload) for track in o)
+            return copy
+        elif isinstance(o, ArrayTrack):
+            copy = self.copy()
+            copy.append(o._rebased(copy.payload))
+            return copy
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __sub__(self, o):
+        if isinstance(o, int):
+            return self + (-o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __rshift__(self, o):
+        if isinstance(o, int):
+            return self._map_tracks(lambda x: x >> o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __lshift__(self, o):
+        if isinstance(o, int):
+            return self >> (-o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __mul__(self, o):
+        if o <= 0:
+            raise TypeError(f"multiplication factor must be greater than zero")
+        elif (isinstance(o, int) or isinstance(o, float)):
+            return self._map_tracks(lambda x: x * o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __truediv__(self, o):
+        if o <= 0:
+            raise TypeError(f"multiplication factor must be greater than zero")
+        elif (isinstance(o, int) or isinstance(o, float)):
+            return self * (1 / o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
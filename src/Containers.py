@@ -8,10 +8,134 @@ TODO: respect pattern format, ignore header track when performing vectorized
 TODO: should tracks care if they have relative ticks or not?
 TODO: implement pow and map methods for pattern
 '''
-from functools import reduce
+import heapq
+import math
+import weakref
+from bisect import bisect_left
+from fractions import Fraction
+from itertools import accumulate, islice
+from operator import attrgetter, itemgetter
 from pprint import pformat, pprint
 from .Constants import MAX_TICK_RESOLUTION
-from .Events import NoteOnEvent, NoteOffEvent, MetaEvent, AbstractEvent, EndOfTrackEvent
+from .Tempo import TempoMap, BarGrid
+from .Events import NoteOnEvent, NoteOffEvent, MetaEvent, AbstractEvent, EndOfTrackEvent, Event, SetTempoEvent, TimeSignatureEvent
+
+def _restore_track(relative, classes, ticks, datas, states):
+    '''Rebuild a pickled track from its columns of event attributes'''
+    track = Track(relative=relative)
+    events = []
+    for cls, tick, data, state in zip(classes, ticks, datas, states):
+        event = cls.__new__(cls)
+        event.tick = tick
+        event._data = data
+        event._view = None
+        event._setstate(state)
+        if event.frozen:
+            event._seal()
+            event = event.freeze()
+        events.append(event)
+    list.extend(track, events)
+    return track
+
+
+def _mutator(name, added=None):
+    '''
+    Wrap a list method so that calling it marks the track as modified. If
+    given, added(args) returns the arguments with the events the call adds,
+    which the caller holds references to, as a list, followed by that list
+    '''
+    method = getattr(list, name)
+
+    def mutate(self, *args):
+        self._touch()
+        if added is not None:
+            args, events = added(args)
+            self._adopt(events)
+        return method(self, *args)
+    mutate.__name__ = name
+    mutate.__doc__ = method.__doc__
+    return mutate
+
+
+def _added_last(args):
+    # append(event) and insert(index, event)
+    return args, args[-1:]
+
+
+def _added_all(args):
+    # extend(events)
+    events = list(args[0])
+    return (events,), events
+
+
+def _added_set(args):
+    # __setitem__(index or slice, event or events)
+    if isinstance(args[0], slice):
+        events = list(args[1])
+        return (args[0], events), events
+    return args, args[1:]
+
+
+class _TrackRef(weakref.ref):
+    '''
+    Weak reference to a track, by which it takes part in the copy-on-write
+    sharing of its events
+    '''
+    __slots__ = ('shared', 'exposed')
+
+    def __init__(self, track):
+        super(_TrackRef, self).__init__(track)
+        self.shared = None
+        # whether code outside the track may hold references to its mutable
+        # events, which it then can't share, nor derive values from for later
+        self.exposed = False
+
+
+class _Shared(object):
+    '''
+    The references of the tracks sharing events through copy-on-write, by id,
+    as references to equal tracks compare equal. None of them has exposed
+    its events
+    '''
+    __slots__ = ('refs',)
+
+    def __init__(self, ref):
+        self.refs = {id(ref): ref}
+        ref.shared = self
+
+    def add(self, ref):
+        # tracks gone drop out
+        self.refs = {key: r for key, r in self.refs.items()
+                     if r() is not None}
+        self.refs[id(ref)] = ref
+        ref.shared = self
+
+    def held(self):
+        '''Return whether a live track holds the events'''
+        return any(r() is not None for r in self.refs.values())
+
+
+def _events(track):
+    '''
+    Iterate over the events of a track without handing them out, for readers
+    that neither keep nor change them, so that a Track keeps its caches.
+    Other iterables of events are iterated over as they are
+    '''
+    if isinstance(track, Track):
+        track._sync()
+        return list.__iter__(track)
+    return iter(track)
+
+
+def _restore_pattern(tracks, resolution, fmt, relative):
+    '''Build a pattern from its tracks, without copying them'''
+    pattern = Pattern.__new__(Pattern)
+    pattern.format = fmt
+    pattern._resolution = resolution
+    pattern._relative = relative
+    list.extend(pattern, tracks)
+    return pattern
+
 
 class Track(list):
     '''
@@ -26,23 +150,245 @@ class Track(list):
             relative: bool - whether or not ticks are relative or absolute
         '''
         self._relative = relative
-        self._length = None
+        # whether the events store relative ticks, which differs from relative
+        # until they are rewritten (see _sync)
+        self._stored = relative
+        # absolute tick of each event, built on demand (see abs_ticks)
+        self._ticks = None
+        # count of the changes that may have moved or altered meta events,
+        # which Pattern.tempo_map and bar_grid are cached against
+        self._meta_changes = 0
+        # raw MTrk chunk the track was read from, until it is modified
+        self._raw = None
+        # whether every tick and data value is known to be an int, so that
+        # writers needn't check for ticks to quantize
+        self._whole = False
+        # _ticks, _raw and _whole are dropped once the track hands out
+        # mutable events, which may then change without its knowledge, and
+        # aren't kept again while they may (see _expose)
+        # reference to the track, which also holds the tracks sharing events
+        # with this one until one writes
+        self._ref = _TrackRef(self)
         super(Track, self).__init__(self.__assert_event(event.copy())
                                     for event in events)
+
+    @classmethod
+    def _wrap(cls, events, relative=True):
+        '''Build a track that takes ownership of events, without copying'''
+        track = cls(relative=relative)
+        list.extend(track, events)
+        return track
+
+    def _cow(self, events):
+        '''
+        Return a track holding events of this one, which are copied when either
+        side is next written to or hands out its events. Events this one
+        handed out are copied now, as they may be changed through references
+        held outside
+        '''
+        if self._ref.exposed:
+            track = Track._wrap([event if event.frozen else event._clone()
+                                 for event in events], self._relative)
+            track._stored = self._stored
+            return track
+        shared = self._ref.shared
+        if shared is None:
+            shared = _Shared(self._ref)
+        track = Track._wrap(events, self._relative)
+        track._stored = self._stored
+        shared.add(track._ref)
+        return track
+
+    def _leave(self):
+        '''Stop sharing events. Returns whether other live tracks still do'''
+        shared = self._ref.shared
+        self._ref.shared = None
+        del shared.refs[id(self._ref)]
+        return shared.held()
+
+    def freeze(self):
+        '''
+        Replace the events of the track with their interned frozen
+        equivalents, so that copies of the track share them. Returns the track
+        '''
+        self._sync()
+        self._unshare()
+        list.__setitem__(self, slice(None),
+                         [event.freeze() for event in list.__iter__(self)])
+        # the events handed out before are no longer the track's
+        self._ref.exposed = False
+        return self
+
+    def _thaw(self):
+        '''Replace frozen events with mutable copies. Returns the track'''
+        for i, event in enumerate(list.__iter__(self)):
+            if event.frozen:
+                list.__setitem__(self, i, event.thaw())
+        return self
+
+    def _unshare(self):
+        '''
+        Stop sharing events with other tracks, copying them if other tracks
+        still hold them
+        '''
+        if self._ref.shared is not None and self._leave():
+            self._copy_events()
+
+    def _copy_events(self):
+        '''Replace the mutable events of the track with copies'''
+        list.__setitem__(self, slice(None),
+                         [event if event.frozen else event._clone()
+                          for event in list.__iter__(self)])
+        self._ref.exposed = False
+
+    def _sync(self):
+        '''
+        Rewrite the ticks of the events as the relative flag asks, if it was
+        changed since they were written
+        '''
+        if self._stored != self._relative:
+            ticks = self.abs_ticks
+            self._unshare()
+            self._thaw()
+            self._stored = self._relative
+            self._set_abs_ticks(ticks)
+
+    def _touch(self):
+        '''
+        Copy shared events and drop the raw chunk and cached values of the
+        track. Called before the track or its events are modified
+        '''
+        self._sync()
+        self._unshare()
+        self._raw = None
+        self._ticks = None
+        self._whole = False
+        self._meta_changes += 1
+
+    def _adopt(self, events):
+        '''Note that events added to the track are held by the caller'''
+        if not all(event.frozen for event in events):
+            self._ref.exposed = True
+
+    def _expose(self):
+        '''
+        Prepare to hand out mutable events: stop sharing them, and drop the
+        values derived from them, which they may change from now on
+        '''
+        self._sync()
+        if not self._ref.exposed:
+            self._unshare()
+            self._raw = None
+            self._ticks = None
+            self._whole = False
+            self._ref.exposed = True
+
+    append = _mutator('append', _added_last)
+    extend = _mutator('extend', _added_all)
+    insert = _mutator('insert', _added_last)
+    pop = _mutator('pop')
+    remove = _mutator('remove')
+    clear = _mutator('clear')
+    reverse = _mutator('reverse')
+    __setitem__ = _mutator('__setitem__', _added_set)
+    __delitem__ = _mutator('__delitem__')
+
+    def sort(self, *, key=None, reverse=False):
+        '''
+        Sort the events in place. Without a key, events are put in the
+        canonical order of AbstractEvent.sort_key by absolute tick, which
+        works on relative tracks too
+        '''
+        if key is not None:
+            self._touch()
+            return list.sort(self, key=key, reverse=reverse)
+        self._sync()
+        ticks = self.abs_ticks
+        if self.relative:
+            self._touch()
+        else:
+            # reordering the list leaves shared events untouched
+            self._raw = None
+            self._meta_changes += 1
+        events = list(list.__iter__(self))
+        # argsort on keys computed once per event
+        keys = [(tick, event._sort_rank())
+                for tick, event in zip(ticks, events)]
+        order = sorted(range(len(keys)), key=keys.__getitem__,
+                       reverse=reverse)
+        ticks = [ticks[i] for i in order]
+        list.__setitem__(self, slice(None), [events[i] for i in order])
+        if self.relative:
+            previous = 0
+            for i, tick in enumerate(ticks):
+                event = list.__getitem__(self, i)
+                if event.tick != tick - previous:
+                    if event.frozen:
+                        event = event.thaw()
+                        list.__setitem__(self, i, event)
+                    event.tick = tick - previous
+                previous = tick
+        if not self._ref.exposed:
+            self._ticks = tuple(ticks)
+
+    def __iter__(self):
+        self._expose()
+        return list.__iter__(self)
+
+    def __reversed__(self):
+        self._expose()
+        return list.__reversed__(self)
     
     def __assert_event(self, event):
         assert isinstance(event, AbstractEvent), "Non-event passed to Track constructor"
         return event
 
+    @property
+    def abs_ticks(self):
+        '''
+        Tuple of the absolute tick of each event, whether or not the track is
+        relative. Built with a prefix sum, and kept until the track changes
+        unless it handed out events, which may change without its knowledge
+        '''
+        ticks = self._ticks
+        if ticks is None:
+            ticks = map(attrgetter('tick'), list.__iter__(self))
+            if self._stored:
+                ticks = accumulate(ticks)
+            ticks = tuple(ticks)
+            if not self._ref.exposed:
+                self._ticks = ticks
+        return ticks
+
     @property
     def length(self):
         '''Compute the length of a track in ticks'''
-        if self._length is None:
-            if self.relative:
-                self._length = reduce(lambda curr, event: curr + event.tick, self, 0)
-            else:
-                self._length = 0 if not len(self) else self[-1].tick
-        return self._length
+        ticks = self.abs_ticks
+        return ticks[-1] if ticks else 0
+
+    def index_at_tick(self, tick):
+        '''
+        Index of the first event at or after the absolute tick, found by
+        bisecting abs_ticks. Events are assumed to be in tick order
+        '''
+        return bisect_left(self.abs_ticks, tick)
+
+    def slice_ticks(self, start, end=None):
+        '''
+        Return a track of the events whose absolute tick is in [start, end),
+        sharing them with this one. In a relative track, the first event's
+        tick is counted from start
+        '''
+        ticks = self.abs_ticks
+        first = bisect_left(ticks, start)
+        last = len(ticks) if end is None else bisect_left(ticks, end, first)
+        track = self._cow(list.__getitem__(self, slice(first, last)))
+        if self._stored and first < last:
+            event = list.__getitem__(track, 0)
+            new = event.thaw() if event.frozen else event._clone()
+            new.tick = ticks[first] - start
+            list.__setitem__(track, 0, new.freeze() if event.frozen else new)
+        return track
 
     @property
     def relative(self):
@@ -50,18 +396,73 @@ class Track(list):
 
     @relative.setter
     def relative(self, val):
-        '''Set the relative flag and mutate events to have relative ticks'''
-        if val != self._relative:
-            self._relative = val
-            running_tick = 0
-            if self._relative:
-                for event in self:
-                    event.tick -= running_tick
-                    running_tick += event.tick
+        '''
+        Set the relative flag. The ticks of the events are rewritten now if
+        events were handed out, else once they are, or the track is sliced or
+        searched (see _sync), and never for abs_ticks, length or writing the
+        raw chunk
+        '''
+        self._relative = bool(val)
+        if self._ref.exposed:
+            self._sync()
+
+    def rescale(self, num, den):
+        '''
+        Multiply the absolute ticks of the track by num / den, exactly: a
+        tick that isn't a whole number of ticks afterwards becomes a Fraction.
+        Relative ticks are taken as differences of the scaled absolute ticks.
+        Returns the track
+        '''
+        ticks = self.abs_ticks
+        whole = self._whole
+        self._touch()
+        self._thaw()
+        scaled = []
+        for tick in ticks:
+            a, b = tick.as_integer_ratio()
+            a *= num
+            b *= den
+            if a % b:
+                scaled.append(Fraction(a, b))
+                whole = False
             else:
-                for event in self:
-                    event.tick += running_tick
-                    running_tick = event.tick
+                scaled.append(a // b)
+        self._set_abs_ticks(scaled)
+        self._whole = whole and not self._ref.exposed
+        return self
+
+    def quantize(self):
+        '''
+        Round ticks and data to whole numbers, half up. Absolute ticks are
+        rounded, so rounding errors don't accumulate along relative ticks.
+        Returns the track
+        '''
+        if self._whole:
+            return self
+        ticks = self.abs_ticks
+        self._touch()
+        self._thaw()
+        rounded = []
+        for tick in ticks:
+            a, b = tick.as_integer_ratio()
+            rounded.append((2 * a + b) // (2 * b))
+        for event in list.__iter__(self):
+            if any(type(datum) is not int for datum in event.data):
+                event.data = [int(math.floor(datum + .5))
+                              for datum in event.data]
+        self._set_abs_ticks(rounded)
+        self._whole = not self._ref.exposed
+        return self
+
+    def _set_abs_ticks(self, ticks):
+        '''Set the ticks of the events from their absolute values'''
+        previous = 0
+        relative = self._stored
+        for event, tick in zip(list.__iter__(self), ticks):
+            event.tick = tick - previous if relative else tick
+            previous = tick
+        if not self._ref.exposed:
+            self._ticks = tuple(ticks)
 
     def make_ticks_abs(self):
         '''Return a copy of the track with absolute ticks'''
@@ -81,7 +482,7 @@ class Track(list):
         Note that ticks are automatically truncated with the max resolution
         when written to disk
         '''
-        copy = self.copy()
+        copy = self.copy()._thaw()
         for event in copy:
             event.tick = int(event.tick + .5)
         return copy
@@ -89,13 +490,67 @@ class Track(list):
     def merge(self, o):
         '''Merge two MIDI tracks, interleaving their events.'''
         assert isinstance(o, Track), "Can only merge with other tracks"
-        abself = self.make_ticks_abs()
-        abso = o.make_ticks_abs()
-        combined = abself + abso
-        combined = Track(events=sorted(combined, key=lambda x: x.tick),
-                         relative=False)
-        combined.relative = self.relative
-        return combined
+        return Track.merge_many([self, o], self.relative)
+
+    @classmethod
+    def merge_many(cls, tracks, relative=True):
+        '''
+        Merge any number of tracks in one pass, interleaving their events by
+        absolute tick with a heap. Events at the same tick keep the order of
+        the tracks, then their order within each track. End-of-track events
+        are replaced by a single one at the end of the longest track
+        '''
+        tracks = list(tracks)
+        assert all(isinstance(track, Track) for track in tracks), \
+            "Can only merge with other tracks"
+        end = max((track.length for track in tracks), default=0)
+        end_of_track = False
+        events = []
+        previous = 0
+        for tick, event in heapq.merge(
+                *(zip(track.abs_ticks, list.__iter__(track))
+                  for track in tracks), key=itemgetter(0)):
+            if isinstance(event, EndOfTrackEvent):
+                end_of_track = True
+                continue
+            new = event._clone()
+            new.tick = tick - previous if relative else tick
+            previous = tick
+            events.append(new)
+        if end_of_track:
+            events.append(EndOfTrackEvent(
+                tick=end - previous if relative else end))
+        return cls._wrap(events, relative)
+
+    def split_channels(self):
+        '''
+        Split the track in one pass into a track of the events without a
+        channel (meta and system events), then a track per channel in channel
+        order. Each ends with an end-of-track event at the end of this track
+        '''
+        ticks = self.abs_ticks
+        end = ticks[-1] if ticks else 0
+        # channel (None for meta and system events) -> events, last tick
+        split = {None: ([], [0])}
+        for tick, event in zip(ticks, list.__iter__(self)):
+            if isinstance(event, EndOfTrackEvent):
+                continue
+            channel = (event.channel if isinstance(event, Event)
+                       and event.status < 0xF0 else None)
+            if channel not in split:
+                split[channel] = ([], [0])
+            events, previous = split[channel]
+            new = event._clone()
+            new.tick = tick - previous[0] if self.relative else tick
+            previous[0] = tick
+            events.append(new)
+        tracks = []
+        for channel in [None] + sorted(c for c in split if c is not None):
+            events, previous = split[channel]
+            events.append(EndOfTrackEvent(
+                tick=end - previous[0] if self.relative else end))
+            tracks.append(Track._wrap(events, self.relative))
+        return tracks
     
     def map(self, f, attr=None, event_type=None):
         '''
@@ -115,7 +570,7 @@ class Track(list):
             A new Track object with f applied to all Events
         '''
         if attr is not None:
-            copy = self.copy()
+            copy = self.copy()._thaw()
             for event in copy:
                 if ((event_type is None or isinstance(event, event_type))
                      and hasattr(event, attr)):
@@ -133,27 +588,92 @@ class Track(list):
         return Track((event for event in self if test(event)),
                      relative=self.relative)
 
+    def map_inplace(self, f, attr=None, event_type=None):
+        '''Like map, but modifies the events of this track. Returns the track'''
+        return self._apply(_mapper(f, attr, event_type), refreeze=False)
+
+    def filter_inplace(self, test):
+        '''Like filter, but removes events from this track. Returns the track'''
+        self._touch()
+        kept = 0
+        for event in list.__iter__(self):
+            if test(event):
+                list.__setitem__(self, kept, event)
+                kept += 1
+        list.__delitem__(self, slice(kept, None))
+        return self
+
+    def lazy(self):
+        '''
+        Return a TrackPipeline recording operators, map and filter over this
+        track, to be applied in a single pass once it is materialized
+        '''
+        return TrackPipeline(self)
+
     def copy(self):
-        return Track((event.copy() for event in self), self.relative)
+        '''Return a copy of the track, sharing its events until written to'''
+        copy = self._cow(list(list.__iter__(self)))
+        copy._raw = self._raw
+        copy._ticks = self._ticks
+        copy._whole = self._whole
+        return copy
+
+    def __reduce__(self):
+        # pickle the events column-wise: much smaller and faster to load
+        # than one pickled object per event
+        self._sync()
+        events = list(list.__iter__(self))
+        return (_restore_track, (self.relative,
+                                 [event.__class__ for event in events],
+                                 [event.tick for event in events],
+                                 [event._data for event in events],
+                                 [event._getstate() for event in events]))
 
     def __getitem__(self, item):
         # TODO: test and fix this.
+        self._sync()
         if isinstance(item, slice):
-            indices = item.indices(len(self))
-            return Track((super(Track, self).__getitem__(i).copy() for i in range(*indices)))
-        else:
-            return super(Track, self).__getitem__(item)
+            return self._cow(super(Track, self).__getitem__(item))
+        event = super(Track, self).__getitem__(item)
+        if not event.frozen and not self._ref.exposed:
+            self._expose()
+            event = super(Track, self).__getitem__(item)
+        return event
+
+    def __contains__(self, item):
+        self._sync()
+        return super(Track, self).__contains__(item)
+
+    def index(self, *args):
+        self._sync()
+        return super(Track, self).index(*args)
+
+    def count(self, item):
+        self._sync()
+        return super(Track, self).count(item)
 
     def __repr__(self):
-        return "mydy.Track(relative: %s\\\n  %s)" % (self.relative, pformat(list(self)).replace('\n', '\n  '), )
+        self._sync()
+        return "mydy.Track(relative: %s\\\n  %s)" % (self.relative, pformat(list(list.__iter__(self))).replace('\n', '\n  '), )
 
     def __eq__(self, o):
+        self._sync()
+        if isinstance(o, Track):
+            o._sync()
         return (super(Track, self).__eq__(o) and self.relative == o.relative)
 
+    def __ne__(self, o):
+        return not self.__eq__(o)
+
     def __add__(self, o):
         # TODO: figure out trackend events
         if isinstance(o, int):
-            return Track(map(lambda x: x + o, self), self.relative)
+            self._sync()
+            new = Track._wrap(map(lambda x: x + o, list.__iter__(self)),
+                              self.relative)
+            # ticks are unchanged
+            new._whole = self._whole
+            return new
         elif isinstance(o, Track):
             # if self has an EndOfTrackEvent, grab it, and slice it out
             eot = None
@@ -163,7 +683,7 @@ class Track(list):
                 copy = self.copy()
             else:
                 copy = self[:-1]
-            ocopy = o.copy()
+            ocopy = o.copy()._thaw()
             ocopy.relative = self.relative
             # nudge ocopy by the tick value of the EOTEvent
             if eot is not None and len(ocopy):
@@ -184,7 +704,12 @@ class Track(list):
     def __rshift__(self, o):
         # TODO: allow function mapping?
         if isinstance(o, int):
-            return Track(map(lambda x: x >> o, self), self.relative)
+            self._sync()
+            new = Track._wrap(map(lambda x: x >> o, list.__iter__(self)),
+                              self.relative)
+            # ticks are unchanged
+            new._whole = self._whole
+            return new
         raise TypeError(
             f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
 
@@ -198,7 +723,9 @@ class Track(list):
         if o <= 0:
             raise TypeError(f"multiplication factor must be greater than zero")
         elif (isinstance(o, int) or isinstance(o, float)) and o > 0:
-            return Track(map(lambda x: x * o, self), self.relative)
+            self._sync()
+            return Track._wrap(map(lambda x: x * o, list.__iter__(self)),
+                               self.relative)
         raise TypeError(
             f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
 
@@ -210,53 +737,90 @@ class Track(list):
         raise TypeError(
             f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
 
-    def __pow__(self, o):
+    def _apply(self, stage, refreeze=True):
+        '''
+        Run stage over every event in place. Frozen events are replaced by
+        the stage's result on a thawed copy, frozen again if refreeze is set
+        '''
+        self._touch()
+        for i, event in enumerate(list.__iter__(self)):
+            if event.frozen:
+                new = stage(event.thaw())
+                list.__setitem__(self, i, new.freeze() if refreeze else new)
+            else:
+                new = stage(event)
+                if new is not event:
+                    list.__setitem__(self, i, new)
+        return self
+
+    def __iadd__(self, o):
+        if isinstance(o, int):
+            return self._apply(_transpose(o))
+        elif isinstance(o, Track):
+            eot = None
+            if len(self) and isinstance(list.__getitem__(self, -1),
+                                        EndOfTrackEvent):
+                eot = self.pop()
+            ocopy = o.copy()._thaw()
+            ocopy.relative = self.relative
+            if eot is not None and len(ocopy):
+                ocopy[0].tick += eot.tick
+            elif eot is not None:
+                ocopy.append(eot)
+            self.extend(ocopy)
+            return self
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __isub__(self, o):
+        if isinstance(o, int):
+            return self._apply(_transpose(-o))
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __irshift__(self, o):
+        if isinstance(o, int):
+            return self._apply(_accent(o))
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __ilshift__(self, o):
+        if isinstance(o, int):
+            return self._apply(_accent(-o))
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __imul__(self, o):
+        if o <= 0:
+            raise TypeError(f"multiplication factor must be greater than zero")
+        elif isinstance(o, int) or isinstance(o, float):
+            return self._apply(_stretch(o))
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __itruediv__(self, o):
+        if o <= 0:
+            raise TypeError(f"multiplication factor must be greater than zero")
+        elif isinstance(o, int) or isinstance(o, float):
+            return self._apply(_stretch(1 / o))
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def loop(self, o):
+        '''
+        Return a TrackLoop that plays the track o times when iterated. A
+        fractional part of o appends that fraction of the track, closing the
+        notes still sounding at the cut. Repetitions leave out meta events
+        and the end-of-track event is kept last
+        '''
         assert 0 < o, "Extension power must be greater than zero"
         if not (isinstance(o, int) or isinstance(o, float)):
             raise TypeError(
                 f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
-        # compute the length of the track in ticks
-        length = self.length 
-        copy = self.make_ticks_rel()
-        # grab the end-of-track-event
-        if isinstance(copy[-1], EndOfTrackEvent):
-            end_of_track = copy[-1]
-            # grab everything but the end-of-track-event
-            new = copy[:-1]
-        else:
-            end_of_track = None
-            new = copy
-        # this is the track we will be adding onto our returned track
-        body = new.filter(lambda x: not MetaEvent.is_event(x.status))
-        # create whole copies of the body
-        for _ in range(1, int(o)):
-            new += body
-        # decide if we're extending by a partial factor, add fraction to the end
-        cutoff = length * (o % 1)
-        if cutoff:
-            # keep track of absolute tick position and which notes are on
-            pos = 0
-            on = set()
-            for i, event in enumerate(body):
-                pos += event.tick
-                if pos > cutoff:
-                    tick = cutoff - (pos - event.tick)
-                    new += body[:i]
-                    for note in on:
-                        new.append(NoteOffEvent(
-                            tick=tick, pitch=note, velocity=0))
-                        # since these are relative ticks, set to 0
-                        tick = 0
-                    break
-                if isinstance(event, NoteOnEvent):
-                    on.add(event.pitch)
-                elif isinstance(event, NoteOffEvent):
-                    try:
-                        on.remove(event.pitch)
-                    except KeyError:
-                        pass
-        if end_of_track is not None:
-            new.append(end_of_track)
+        return TrackLoop(self, o)
+
+    def __pow__(self, o):
+        new = self.loop(o).materialize()
         new.relative = self.relative
         return new
 
@@ -297,15 +861,146 @@ class Pattern(list):
 
     @resolution.setter
     def resolution(self, val):
+        '''
+        Convert the ticks of every track to the new resolution exactly (see
+        Track.rescale). Ticks that fall between whole ticks are kept as
+        Fractions until the tracks are quantized, which FileWriter does at
+        this resolution
+        '''
         assert 0 <= val <= MAX_TICK_RESOLUTION, "Invalid 2-byte value"
-        coeff = val / self.resolution
         for track in self:
-            for event in track:
-                event.tick *= coeff
+            track.rescale(val, self.resolution)
         self._resolution = val
 
+    def _cached(self, name, build):
+        '''
+        Return the index stored in attribute name, or build it from the
+        pattern if the resolution or a track changed since it was stored, or
+        a track handed out events, which may have changed since
+        '''
+        key = [(track, track._meta_changes) for track in self]
+        cached = getattr(self, name, None)
+        if (cached is not None and
+                not any(track._ref.exposed for track in self)):
+            index, resolution, cached_key = cached
+            if (resolution == self.resolution and len(key) == len(cached_key)
+                    and all(track is cached_track and changes == cached_changes
+                            for (track, changes), (cached_track, cached_changes)
+                            in zip(key, cached_key))):
+                return index
+        index = build(self)
+        setattr(self, name, (index, self.resolution, key))
+        return index
+
+    @property
+    def tempo_map(self):
+        '''
+        TempoMap of the SetTempoEvents of every track, for converting between
+        ticks and seconds, cached as Pattern._cached describes
+        '''
+        return self._cached('_tempo_map', TempoMap.from_pattern)
+
+    @property
+    def bar_grid(self):
+        '''
+        BarGrid of the TimeSignatureEvents of every track, for converting
+        between ticks and bars. Cached like tempo_map
+        '''
+        return self._cached('_bar_grid', BarGrid.from_pattern)
+
+    def bar_to_tick(self, bar, beat=0):
+        '''Absolute tick of a beat of a bar, counting both from 0'''
+        return self.bar_grid.bar_to_tick(bar, beat)
+
+    def tick_to_bar(self, tick):
+        '''(bar, beat) at an absolute tick (see BarGrid.tick_to_bar)'''
+        return self.bar_grid.tick_to_bar(tick)
+
+    def slice_bars(self, start, end=None):
+        '''
+        Return a pattern of the bars in [start, end), starting at tick 0 and
+        sharing events with this one. Its first track opens with the tempo and
+        time signature in effect at the start bar, and every track ends with
+        an EndOfTrackEvent
+        '''
+        first = self.bar_to_tick(start)
+        last = None if end is None else self.bar_to_tick(end)
+        carried = [SetTempoEvent(tick=0, mpqn=self.tempo_map.mpqn(first)),
+                   TimeSignatureEvent(
+                       tick=0, data=self.bar_grid.meter_at(first).data)]
+        tracks = []
+        for i, track in enumerate(self):
+            view = track.slice_ticks(first, last)
+            if not view._stored and first:
+                # absolute ticks still count from the start of the track
+                ticks = [tick - first for tick in view.abs_ticks]
+                view._unshare()
+                view._thaw()
+                view._set_abs_ticks(ticks)
+            if i == 0 and first:
+                # state events the slice already opens with take precedence
+                opening = set(type(event) for event in
+                              islice(list.__iter__(view),
+                                     view.index_at_tick(1)))
+                for event in reversed(carried):
+                    if type(event) not in opening:
+                        list.insert(view, 0, event)
+                view._ticks = None
+            ends = view and isinstance(list.__getitem__(view, -1),
+                                       EndOfTrackEvent)
+            if not ends:
+                span = view.length if last is None else last - first
+                list.append(view, EndOfTrackEvent(
+                    tick=span - view.length if view._stored else span))
+                view._ticks = None
+            tracks.append(view)
+        return _restore_pattern(tracks, self.resolution, self.format,
+                                self.relative)
+
+    @property
+    def duration(self):
+        '''Length of the longest track in seconds'''
+        return self.tempo_map.seconds(
+            max((track.length for track in self), default=0))
+
+    def quantize(self):
+        '''Quantize the ticks of every track (see Track.quantize)'''
+        for track in self:
+            track.quantize()
+        return self
+
     def copy(self):
-        return Pattern((track.copy() for track in self), self.resolution, self.format, self.relative)
+        return _restore_pattern([track.copy() for track in self],
+                                self.resolution, self.format, self.relative)
+
+    def freeze(self):
+        '''Freeze the events of every track (see Track.freeze). Returns self'''
+        for track in self:
+            track.freeze()
+        return self
+
+    def flatten(self):
+        '''Merge every track into one, returning a format 0 pattern'''
+        return _restore_pattern([Track.merge_many(self, self.relative)],
+                                self.resolution, 0, self.relative)
+
+    def split_channels(self):
+        '''
+        Inverse of flatten: return a format 1 pattern whose first track holds
+        the meta and system events, followed by a track per channel
+        '''
+        track = (self[0] if len(self) == 1
+                 else Track.merge_many(self, self.relative))
+        return _restore_pattern(track.split_channels(), self.resolution, 1,
+                                self.relative)
+
+    def lazy(self):
+        '''Return a PatternPipeline over every track (see Track.lazy)'''
+        return PatternPipeline(self)
+
+    def __reduce__(self):
+        return (_restore_pattern, (list(self), self.resolution, self.format,
+                                   self.relative))
 
     def __repr__(self):
         return "mydy.Pattern(format=%r, resolution=%r, tracks=\\\n%s)" % \
@@ -320,8 +1015,9 @@ class Pattern(list):
     def __add__(self, o):
         # TODO: consider formats when adding tracks
         if isinstance(o, int):
-            return Pattern(map(lambda x: x + o, self), self.resolution,
-                           self.format, self.relative)
+            return _restore_pattern(list(map(lambda x: x + o, self)),
+                                    self.resolution, self.format,
+                                    self.relative)
         elif isinstance(o, Pattern):
             copy = self.copy()
             copy.extend(o.copy())
@@ -362,8 +1058,9 @@ class Pattern(list):
 
     def __rshift__(self, o):
         if isinstance(o, int):
-            return Pattern(map(lambda x: x >> o, self), self.resolution,
-                           self.format, self.relative)
+            return _restore_pattern(list(map(lambda x: x >> o, self)),
+                                    self.resolution, self.format,
+                                    self.relative)
         raise TypeError(
             f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
 
@@ -377,8 +1074,9 @@ class Pattern(list):
         if o <= 0:
             raise TypeError(f"multiplication factor must be greater than zero")
         elif (isinstance(o, int) or isinstance(o, float)):
-            return Pattern(map(lambda x: x * o, self), self.resolution,
-                           self.format, self.relative)
+            return _restore_pattern(list(map(lambda x: x * o, self)),
+                                    self.resolution, self.format,
+                                    self.relative)
         raise TypeError(
             f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
 
@@ -390,9 +1088,402 @@ class Pattern(list):
         raise TypeError(
             f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
 
+    def __iadd__(self, o):
+        if isinstance(o, int):
+            for track in self:
+                track += o
+            return self
+        elif isinstance(o, Pattern):
+            self.extend([track.copy() for track in o])
+            return self
+        elif isinstance(o, Track):
+            ocopy = o.copy()
+            ocopy.relative = self.relative
+            self.append(ocopy)
+            return self
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __isub__(self, o):
+        if isinstance(o, int):
+            for track in self:
+                track -= o
+            return self
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __irshift__(self, o):
+        if isinstance(o, int):
+            for track in self:
+                track >>= o
+            return self
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __ilshift__(self, o):
+        if isinstance(o, int):
+            for track in self:
+                track <<= o
+            return self
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __imul__(self, o):
+        if o <= 0:
+            raise TypeError(f"multiplication factor must be greater than zero")
+        elif isinstance(o, int) or isinstance(o, float):
+            for track in self:
+                track *= o
+            return self
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __itruediv__(self, o):
+        if o <= 0:
+            raise TypeError(f"multiplication factor must be greater than zero")
+        elif isinstance(o, int) or isinstance(o, float):
+            for track in self:
+                track /= o
+            return self
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def map_inplace(self, f, attr=None, event_type=None):
+        '''Track.map_inplace over every track. Returns the pattern'''
+        for track in self:
+            track.map_inplace(f, attr, event_type)
+        return self
+
+    def filter_inplace(self, test):
+        '''Track.filter_inplace over every track. Returns the pattern'''
+        for track in self:
+            track.filter_inplace(test)
+        return self
+
     def __getitem__(self, item):
         if isinstance(item, slice):
-            indices = item.indices(len(self))
-            return Pattern((super(Pattern, self).__getitem__(i).copy() for i in range(*indices)))
+            return _restore_pattern(
+                [track.copy() for track in
+                 super(Pattern, self).__getitem__(item)],
+                self.resolution, self.format, self.relative)
         else:
             return super(Pattern, self).__getitem__(item)
+
+
+class _UnloadedTrack(object):
+    '''Placeholder for a track of a LazyPattern that hasn't been parsed'''
+
+    def __init__(self, index):
+        self.index = index
+
+    def __repr__(self):
+        return "<unloaded track %d>" % self.index
+
+
+class LazyPattern(Pattern):
+    '''
+    Pattern whose tracks are parsed on first access. Holds a placeholder for
+    each track until it is touched, at which point loader(index) is called
+    with the track's position in the file and must return a Track.
+    '''
+
+    def __init__(self, loader, num_tracks, resolution=220, fmt=1):
+        self.format = fmt
+        self._resolution = resolution
+        self._relative = True
+        self._loader = loader
+        list.__init__(self, (_UnloadedTrack(i) for i in range(num_tracks)))
+
+    def _load(self, i):
+        track = list.__getitem__(self, i)
+        if isinstance(track, _UnloadedTrack):
+            track = self._loader(track.index)
+            track.relative = self._relative
+            list.__setitem__(self, i, track)
+        return track
+
+    def load(self):
+        '''Parse every track that hasn't been parsed yet'''
+        for i in range(len(self)):
+            self._load(i)
+        return self
+
+    @property
+    def loaded(self):
+        '''List of booleans telling which tracks have been parsed'''
+        return [not isinstance(track, _UnloadedTrack)
+                for track in list.__iter__(self)]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            for i in range(*item.indices(len(self))):
+                self._load(i)
+            return super(LazyPattern, self).__getitem__(item)
+        return self._load(item)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._load(i)
+
+    def __reversed__(self):
+        for i in reversed(range(len(self))):
+            yield self._load(i)
+
+    def __eq__(self, o):
+        return super(LazyPattern, self.load()).__eq__(o)
+
+    def __contains__(self, item):
+        return super(LazyPattern, self.load()).__contains__(item)
+
+    def index(self, *args):
+        return super(LazyPattern, self.load()).index(*args)
+
+    def count(self, item):
+        return super(LazyPattern, self.load()).count(item)
+
+    def pop(self, *args):
+        return super(LazyPattern, self.load()).pop(*args)
+
+    def remove(self, item):
+        return super(LazyPattern, self.load()).remove(item)
+
+
+def _transpose(o):
+    def stage(event):
+        if hasattr(event, 'pitch'):
+            event.pitch += o
+        return event
+    return stage
+
+
+def _accent(o):
+    def stage(event):
+        if hasattr(event, 'velocity'):
+            event.velocity += o
+        return event
+    return stage
+
+
+def _stretch(o):
+    def stage(event):
+        event.tick *= o
+        return event
+    return stage
+
+
+def _mapper(f, attr, event_type):
+    def stage(event):
+        if event_type is not None and not isinstance(event, event_type):
+            return event
+        if attr is None:
+            return f(event)
+        if hasattr(event, attr):
+            setattr(event, attr, f(event))
+        return event
+    return stage
+
+
+def _filterer(test):
+    def stage(event):
+        return event if test(event) else None
+    return stage
+
+
+class TrackPipeline(object):
+    '''
+    Deferred chain of operators over the events of a Track, returned by
+    Track.lazy(). Operators, map and filter are recorded, then applied in a
+    single pass when the pipeline is iterated or materialized: each kept
+    event is copied once and every stage modifies that copy in place.
+    '''
+
+    def __init__(self, source, filters=(), stages=()):
+        self.source = source
+        # filters preceding every other stage, tested on the source events
+        # so that dropped events are never copied
+        self._filters = filters
+        self._stages = stages
+
+    def _chain(self, stage=None, test=None):
+        new = object.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        if stage is not None:
+            new._stages = self._stages + (stage,)
+        else:
+            new._filters = self._filters + (test,)
+        return new
+
+    @property
+    def relative(self):
+        return self.source.relative
+
+    def _events(self):
+        '''The events fed to the stages, which copy them before any change'''
+        self.source._sync()
+        return list.__iter__(self.source)
+
+    def __iter__(self):
+        filters = self._filters
+        stages = self._stages
+        for event in self._events():
+            if not all(test(event) for test in filters):
+                continue
+            event = event._clone()
+            for stage in stages:
+                event = stage(event)
+                if event is None:
+                    break
+            else:
+                yield event
+
+    def materialize(self):
+        '''Run the pipeline, returning a new Track'''
+        return Track._wrap(self, self.relative)
+
+    def map(self, f, attr=None, event_type=None):
+        '''Record a Track.map stage'''
+        return self._chain(_mapper(f, attr, event_type))
+
+    def filter(self, test):
+        '''Record a Track.filter stage'''
+        if not self._stages:
+            return self._chain(test=test)
+        return self._chain(_filterer(test))
+
+    def __add__(self, o):
+        if isinstance(o, int):
+            return self._chain(_transpose(o))
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __sub__(self, o):
+        if isinstance(o, int):
+            return self + (-o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __rshift__(self, o):
+        if isinstance(o, int):
+            return self._chain(_accent(o))
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __lshift__(self, o):
+        if isinstance(o, int):
+            return self >> (-o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __mul__(self, o):
+        if o <= 0:
+            raise TypeError(f"multiplication factor must be greater than zero")
+        elif isinstance(o, int) or isinstance(o, float):
+            return self._chain(_stretch(o))
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __truediv__(self, o):
+        if o <= 0:
+            raise TypeError(f"multiplication factor must be greater than zero")
+        elif isinstance(o, int) or isinstance(o, float):
+            return self * (1 / o)
+        raise TypeError(
+            f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
+
+    def __repr__(self):
+        return "mydy.TrackPipeline(stages=%d, source=%r)" % (
+            len(self._filters) + len(self._stages), self.source)
+
+
+class TrackLoop(TrackPipeline):
+    '''
+    Track repeated factor times, returned by Track.loop(). Nothing is copied
+    until it is iterated, materialized or written, so that the cost is linear
+    in the events produced. Supports the same operators as TrackPipeline.
+    Its ticks are always relative.
+    '''
+
+    def __init__(self, source, factor):
+        super(TrackLoop, self).__init__(source)
+        self.factor = factor
+
+    @property
+    def relative(self):
+        return True
+
+    def _events(self):
+        source = self.source
+        if not len(source):
+            return
+        # the length of the source, including the end-of-track tick
+        length = source.length
+        if not source.relative:
+            source = source.make_ticks_rel()
+        source._sync()
+        events = list.__getitem__(source, slice(None))
+        end_of_track = None
+        if isinstance(events[-1], EndOfTrackEvent):
+            end_of_track = events.pop()
+        yield from events
+        # repetitions leave out meta events
+        body = [event for event in events
+                if not MetaEvent.is_event(event.status)]
+        for _ in range(1, int(self.factor)):
+            yield from body
+        # decide if we're extending by a partial factor, add fraction to the end
+        cutoff = length * (self.factor % 1)
+        if cutoff:
+            # keep track of absolute tick position and which notes are on
+            pos = 0
+            on = set()
+            for i, event in enumerate(body):
+                pos += event.tick
+                if pos > cutoff:
+                    tick = cutoff - (pos - event.tick)
+                    yield from islice(body, i)
+                    for note in on:
+                        yield NoteOffEvent(tick=tick, pitch=note, velocity=0)
+                        # since these are relative ticks, set to 0
+                        tick = 0
+                    break
+                if isinstance(event, NoteOnEvent):
+                    on.add(event.pitch)
+                elif isinstance(event, NoteOffEvent):
+                    on.discard(event.pitch)
+        if end_of_track is not None:
+            yield end_of_track
+
+    def __repr__(self):
+        return "mydy.TrackLoop(factor=%r, stages=%d, source=%r)" % (
+            self.factor, len(self._filters) + len(self._stages), self.source)
+
+
+class PatternPipeline(TrackPipeline):
+    '''
+    Deferred chain of operators over every track of a Pattern, returned by
+    Pattern.lazy(). Iterating it yields a TrackPipeline per track.
+    '''
+
+    @property
+    def resolution(self):
+        return self.source.resolution
+
+    @property
+    def format(self):
+        return self.source.format
+
+    def __len__(self):
+        return len(self.source)
+
+    def __iter__(self):
+        for track in self.source:
+            yield TrackPipeline(track, self._filters, self._stages)
+
+    def materialize(self):
+        '''Run the pipeline over every track, returning a new Pattern'''
+        return _restore_pattern([track.materialize() for track in self],
+                                self.resolution, self.format, self.relative)
+
+    def __repr__(self):
+        return "mydy.PatternPipeline(stages=%d, tracks=%d)" % (
+            len(self._filters) + len(self._stages), len(self))
@@ -0,0 +1,119 @@
+'''
+Read collections of MIDI files in parallel over a pool of worker processes
+
+Patterns travel back from the workers through pickle, which Track and
+Pattern support column-wise (see Track.__reduce__), so shipping a pattern
+costs a fraction of parsing it.
+'''
+import os
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from .FileIO import read_midifile
+
+# Result of reading one file of a corpus. Exactly one of pattern and error is
+# None.
+CorpusResult = namedtuple('CorpusResult', ['index', 'path', 'pattern',
+                                           'error'])
+
+# Why a file of a corpus couldn't be read
+CorpusError = namedtuple('CorpusError', ['type', 'message', 'traceback'])
+
+
+def _read_one(index, path, kwargs):
+    '''Read one file, turning any exception into a CorpusError'''
+    try:
+        return CorpusResult(index, path, read_midifile(path, **kwargs), None)
+    except Exception as e:
+        return CorpusResult(index, path, None, _error(e))
+
+
+def _error(e):
+    return CorpusError(type(e).__name__, str(e), traceback.format_exc())
+
+
+def read_corpus(paths, workers=None, ordered=False, max_in_flight=None,
+                mp_context=None, **kwargs):
+    '''
+    Read MIDI files over a pool of worker processes, yielding a CorpusResult
+    for each path. Files that fail to parse produce a result carrying a
+    CorpusError instead of raising. When a worker dies, the files in flight
+    are read again one at a time, and only one that kills a worker alone
+    fails, with a BrokenProcessPool error.
+    Params:
+        paths: iterable - paths of the files to read, consumed lazily
+        Optional:
+        workers: int - number of worker processes, defaulting to the number
+            of CPUs. 0 reads the files in this process
+        ordered: bool - yield results in the order of paths rather than as
+            they complete
+        max_in_flight: int - most files being read or waiting to be yielded
+            at once, defaulting to four per worker
+        mp_context: multiprocessing context the workers are started from,
+            defaulting to that of ProcessPoolExecutor
+        kwargs: passed on to read_midifile
+    '''
+    paths = enumerate(paths)
+    if workers == 0:
+        for index, path in paths:
+            yield _read_one(index, path, kwargs)
+        return
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 4 * workers
+    assert max_in_flight > 0, "max_in_flight must be greater than zero"
+    pool = ProcessPoolExecutor(workers, mp_context)
+    try:
+        pending = {}
+        # results held back until the results before them are yielded
+        completed = {}
+        # files in flight when a worker died, read again alone to tell the
+        # file that killed it from the others
+        suspects = []
+        next_index = 0
+        while True:
+            if suspects:
+                if not pending:
+                    index, path = suspects.pop(0)
+                    future = pool.submit(_read_one, index, path, kwargs)
+                    pending[future] = (index, path)
+            else:
+                while len(pending) + len(completed) < max_in_flight:
+                    try:
+                        index, path = next(paths)
+                    except StopIteration:
+                        break
+                    future = pool.submit(_read_one, index, path, kwargs)
+                    pending[future] = (index, path)
+            if not pending:
+                break
+            alone = len(pending) == 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            if any(isinstance(future.exception(), BrokenProcessPool)
+                   for future in done):
+                # a worker died, failing every file in flight with it: go on
+                # with a new pool
+                done, _ = wait(pending)
+                pool.shutdown()
+                pool = ProcessPoolExecutor(workers, mp_context)
+            for future in sorted(done, key=pending.get):
+                index, path = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    if not alone:
+                        suspects.append((index, path))
+                        continue
+                    result = CorpusResult(index, path, None, _error(e))
+                except Exception as e:
+                    # the worker itself failed
+                    result = CorpusResult(index, path, None, _error(e))
+                if ordered:
+                    completed[index] = result
+                else:
+                    yield result
+            while next_index in completed:
+                yield completed.pop(next_index)
+                next_index += 1
+    finally:
+        pool.shutdown()
@@ -1,16 +1,200 @@
 '''
 A collection of MIDI events
 
+Events use __slots__ and keep their data bytes in a bytes object whenever
+every value fits in a byte. Data that doesn't (e.g. a pitch transposed past
+255 before being truncated on write) is kept as a list. event.data hands the
+values out as a list whose changes are written back to the event.
+
+Every registered event class X has a frozen variant FrozenX, whose instances
+are immutable and hashable. event.freeze() returns the interned frozen
+equivalent of an event, so equal frozen events share one object.
+
+tick and channel are plain slots, so that setting them costs no more than
+setting an attribute. Tracks don't hear of changes to the events they hand
+out: see Track._expose for how they keep what they derive from their events.
 '''
 import math
+import weakref
+from warnings import warn
+from .Util import read_varlen_at, write_varlen
+
+
+def _compact(data):
+    '''Return data as bytes if every value fits in a byte, else as a list'''
+    if type(data) is bytes:
+        return data
+    try:
+        return bytes(data)
+    except (TypeError, ValueError):
+        return list(data)
+
+
+def _same_data(a, b):
+    '''Whether two compacted data values hold the same numbers'''
+    return a == b or (type(a) is not type(b) and list(a) == list(b))
+
+
+def _writes_back(name):
+    '''Wrap a list method so that calling it updates the event viewed'''
+    method = getattr(list, name)
+
+    def write(self, *args):
+        result = method(self, *args)
+        self._event.data = self
+        return result
+    write.__name__ = name
+    write.__doc__ = method.__doc__
+    return write
+
+
+class DataView(list):
+    '''
+    List of the data values of an event, returned by AbstractEvent.data.
+    Changing it changes the event, as when data was a plain list attribute
+    '''
+    __slots__ = ('_event',)
+
+    def __init__(self, event):
+        super(DataView, self).__init__(event._data)
+        self._event = event
+
+    def __iadd__(self, other):
+        list.__iadd__(self, other)
+        self._event.data = self
+        return self
+
+    def __imul__(self, other):
+        list.__imul__(self, other)
+        self._event.data = self
+        return self
+
+    __setitem__ = _writes_back('__setitem__')
+    __delitem__ = _writes_back('__delitem__')
+    append = _writes_back('append')
+    extend = _writes_back('extend')
+    insert = _writes_back('insert')
+    pop = _writes_back('pop')
+    remove = _writes_back('remove')
+    clear = _writes_back('clear')
+    reverse = _writes_back('reverse')
+
+    def sort(self, *, key=None, reverse=False):
+        list.sort(self, key=key, reverse=reverse)
+        self._event.data = self
+
+
+def _restore_event(cls, tick, data, state):
+    '''Rebuild a pickled event without going through its constructor'''
+    event = cls.__new__(cls)
+    event.tick = tick
+    event._data = data
+    event._view = None
+    event._setstate(state)
+    if event.frozen:
+        event._seal()
+        return event.freeze()
+    return event
+
+
+# interned frozen events by _intern_key()
+_interned = weakref.WeakValueDictionary()
+
+# attributes that only cache values derived from the others, which frozen
+# events may still fill in
+_CACHE_SLOTS = frozenset(['_text', '_rank'])
+
+
+class _Frozen(object):
+    '''
+    Mixin of the frozen event variants. Attributes can be set until the event
+    is sealed at the end of construction; after that the event is immutable
+    and hashes by value
+    '''
+    __slots__ = ()
+    frozen = True
+
+    def __init__(self, *args, **kw):
+        super(_Frozen, self).__init__(*args, **kw)
+        self._seal()
+
+    def _seal(self):
+        object.__setattr__(self, '_hash', hash(self._key()))
+
+    def __setattr__(self, name, value):
+        if name in _CACHE_SLOTS or not hasattr(self, '_hash'):
+            object.__setattr__(self, name, value)
+        else:
+            raise AttributeError("can't modify frozen %s" %
+                                 self.__class__.__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("can't modify frozen %s" %
+                             self.__class__.__name__)
+
+    def __hash__(self):
+        return self._hash
+
+    def _sort_rank(self):
+        try:
+            return self._rank
+        except AttributeError:
+            self._rank = super(_Frozen, self)._sort_rank()
+            return self._rank
+
+    def copy(self):
+        # immutable, so copies can share the event
+        return self
+
+    def freeze(self):
+        return _interned.setdefault(self._intern_key(), self)
+
+    def thaw(self):
+        return _restore_event(self._event_class, self.tick, self._data,
+                              self._getstate())
+
+    @property
+    def data(self):
+        # not cached: the event is shared, and a view changed in place could
+        # no longer match it
+        return DataView(self)
+
+    @data.setter
+    def data(self, data):
+        raise AttributeError("can't modify frozen %s" %
+                             self.__class__.__name__)
+
+
+def frozen_class(cls):
+    '''Return the frozen variant of an event class, creating it if needed'''
+    if cls.frozen:
+        return cls
+    frozen = cls.__dict__.get('_frozen_class')
+    if frozen is None:
+        name = 'Frozen' + cls.__name__
+        frozen = EventMetaclass(name, (_Frozen, cls), {
+            '__slots__': ('__weakref__', '_hash', '_rank'),
+            '__module__': __name__,
+            '__qualname__': name,
+            '_event_class': cls,
+            'frozen': True,
+        })
+        # frozen classes live in this module so that they can be pickled
+        globals()[name] = frozen
+        cls._frozen_class = frozen
+    return frozen
 
 
 class EventRegistry(object):
     '''
     Class that registers the different Events and MetaEvents defined here.
+    Dispatch maps each of the 256 status bytes to the class that decodes
+    events starting with it (channel included), or None for data bytes and
+    unsupported statuses.
     '''
     Events = {}
     MetaEvents = {}
+    Dispatch = [None] * 256
 
     @classmethod
     def register_event(cls, event, bases):
@@ -21,25 +205,66 @@ class EventRegistry(object):
             assert event.status not in cls.Events, \
                 "Event %s already registered" % event.name
             cls.Events[event.status] = event
+            # channel messages carry their channel in the low nibble
+            channels = 16 if event.status < 0xF0 else 1
+            cls.Dispatch[event.status:event.status + channels] = \
+                [event] * channels
         elif (MetaEvent in bases) or (MetaEventWithText in bases):
-            if event.metacommand is not None:
+            if isinstance(event.metacommand, int):
                 assert event.metacommand not in cls.MetaEvents, \
                     "Event %s already registered" % event.name
                 cls.MetaEvents[event.metacommand] = event
+            # meta events share a status byte, and are told apart by
+            # MetaEvent.read_at
+            cls.Dispatch[MetaEvent.status] = MetaEvent
         else:
             raise ValueError("Unknown bases class in event type: ", event.name)
 
 
+class _MetaCommand(object):
+    '''
+    Descriptor of MetaEvent.metacommand: the metacommand an event was given,
+    or else the one of its class
+    '''
+
+    def __get__(self, event, cls):
+        if event is not None and event._metacommand is not None:
+            return event._metacommand
+        return cls._class_metacommand
+
+    def __set__(self, event, metacommand):
+        event._metacommand = metacommand
+
+
+_metacommand = _MetaCommand()
+
+
 class EventMetaclass(type):
     '''
     Metaclass for MIDI events, which registers classes with EventRegistry as
-    they are declared.
+    they are declared. Classes that don't declare __slots__ get empty ones, so
+    events never carry a __dict__; subclasses adding instance attributes must
+    list them in __slots__.
     '''
 
+    def __new__(mcs, name, superclasses, attributedict):
+        attributedict.setdefault('__slots__', ())
+        if 'metacommand' in attributedict:
+            # instances may override the metacommand of their class
+            attributedict['_class_metacommand'] = attributedict['metacommand']
+            attributedict['metacommand'] = _metacommand
+        return super(EventMetaclass, mcs).__new__(mcs, name, superclasses,
+                                                  attributedict)
+
     def __init__(cls, name, superclasses, attributedict):
+        if attributedict.get('frozen'):
+            # frozen variants share the registration of the class they freeze
+            return
+        cls._event_class = cls
         if name not in ['AbstractEvent', 'Event', 'MetaEvent', 'NoteEvent',
                         'MetaEventWithText']:
             EventRegistry.register_event(cls, superclasses)
+            frozen_class(cls)
 
 
 class AbstractEvent(metaclass=EventMetaclass):
@@ -47,25 +272,117 @@ class AbstractEvent(metaclass=EventMetaclass):
     Abstract MIDI event, from which Event and MetaEvent inherit.
     '''
 
+    __slots__ = ('tick', '_data', '_view')
     name = "Generic MIDI Event"
     length = 0
     status = 0x0
+    frozen = False
+    # order of events at the same tick, see sort_key:
+    #   0 meta events
+    #   1 system events
+    #   2 channel events other than notes
+    #   3 note offs (including note ons without velocity)
+    #   4 note ons
+    #   5 end of track
+    sort_priority = 1
 
     def __init__(self, tick=0, data=[]):
         if not data and isinstance(self.length, int):
             data = [0] * self.length
         self.tick = tick
-        self.data = data
+        self._data = _compact(data)
+        # DataView handed out by data, until _data is replaced
+        self._view = None
+
+    @property
+    def data(self):
+        '''
+        Data values of the event, as a DataView list. They are stored as bytes
+        or, if out of range, a list
+        '''
+        view = self._view
+        if view is None:
+            view = self._view = DataView(self)
+        return view
+
+    @data.setter
+    def data(self, data):
+        self._data = _compact(data)
+        if data is not self._view:
+            # the view writing itself back stays current
+            self._view = None
+
+    def _set_datum(self, i, val):
+        '''Set the data value at index i'''
+        data = list(self._data)
+        data[i] = val
+        self._data = _compact(data)
+        if self._view is not None:
+            list.__setitem__(self._view, i, val)
+
+    def _sort_rank(self):
+        '''Part of sort_key after the tick. Frozen events cache it'''
+        return (self.sort_priority, 0, tuple(self._data))
+
+    @property
+    def sort_key(self):
+        '''
+        Canonical ordering of events: by tick, then sort_priority, then
+        channel and data
+        '''
+        return (self.tick, self._sort_rank())
 
     def __lt__(self, other):
-        if self.tick < other.tick:
-            return True
-        return self.data < other.data
+        if self.tick != other.tick:
+            return self.tick < other.tick
+        return self._sort_rank() < other._sort_rank()
 
     def __eq__(self, other):
-        return (self.__class__ is other.__class__ and
+        # frozen events equal their mutable counterparts
+        return (self._event_class is getattr(other, '_event_class', None) and
                 self.tick == other.tick and
-                self.data == other.data)
+                _same_data(self._data, other._data))
+
+    def _key(self):
+        '''Values compared by __eq__, which frozen events hash'''
+        return (self._event_class, self.tick, tuple(self._data))
+
+    def _intern_key(self):
+        '''
+        _key with the types of the tick and data values, so that equal events
+        holding e.g. a float tick rather than an int aren't interned as one
+        '''
+        data = self._data
+        return (self._key(), type(self.tick),
+                None if type(data) is bytes else tuple(map(type, data)))
+
+    def freeze(self):
+        '''Return the interned, immutable and hashable copy of the event'''
+        return frozen_class(self.__class__)._from(self).freeze()
+
+    def thaw(self):
+        '''Return a mutable copy of the event'''
+        data = self._data
+        return _restore_event(self._event_class, self.tick,
+                              data if type(data) is bytes else list(data),
+                              self._getstate())
+
+    @classmethod
+    def _from(cls, event):
+        '''Build an instance of cls with the attributes of event'''
+        return _restore_event(cls, event.tick, event._data,
+                              event._getstate())
+
+    def _clone(self):
+        '''Return a mutable copy of the event, bypassing its constructor'''
+        data = self._data
+        return _restore_event(self._event_class, self.tick,
+                              data if type(data) is bytes else list(data),
+                              self._getstate())
+
+    def _result(self, new):
+        '''Return the result of an operator, frozen if self is'''
+        return new.freeze() if self.frozen else new
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -75,6 +392,8 @@ class AbstractEvent(metaclass=EventMetaclass):
         body = []
         for key in keys:
             val = getattr(self, key)
+            if key == 'data':
+                val = list(val)
             keyval = "%s=%r" % (key, val)
             body.append(keyval)
         body = str.join(', ', body)
@@ -84,14 +403,61 @@ class AbstractEvent(metaclass=EventMetaclass):
         return self._baserepr()
 
     def copy(self):
-        return self.__class__(tick=self.tick, data=self.data.copy())
+        return self.__class__(tick=self.tick, data=self._data)
+
+    def _getstate(self):
+        '''State beyond tick and data needed to rebuild the event'''
+        return None
+
+    def _setstate(self, state):
+        pass
+
+    def __reduce__(self):
+        return (_restore_event, (self.__class__, self.tick, self._data,
+                                 self._getstate()))
+
+    # Encoder and decoder hooks, looked up through EventRegistry.Dispatch by
+    # status byte when reading and on the event's class when writing. view is
+    # a memoryview and offset the index following the status byte.
+
+    @classmethod
+    def read_at(cls, tick, status, view, offset):
+        '''
+        Decode the event whose data starts at offset. Returns the event and
+        the offset following it
+        '''
+        raise ValueError("Unknown MIDI Event status: " + str(status))
+
+    @classmethod
+    def skip_at(cls, view, offset):
+        '''Return the offset following the event, without decoding it'''
+        raise ValueError("Unknown MIDI Event")
+
+    def write_to(self, buf, running_status=None):
+        '''
+        Append the encoding of the event, less its delta tick, to buf.
+        Returns the running status following the event
+        '''
+        raise ValueError("Unknown MIDI Event: " + str(self))
+
+    # ALSA sequencer hook, looked up on the event's class by
+    # Sequencer.event_write. alsa is the sequencer_alsa module, whose
+    # constants the hook uses, and queue the sequencer's queue.
+
+    def alsa_write(self, seqev, alsa, queue):
+        '''
+        Fill in the type and data of an snd_seq_event_t for the event.
+        Returns True, None if the sequencer should drop the event, or False
+        if it can't play it
+        '''
+        return False
 
     def __add__(self, o):
         if isinstance(o, int):
             if hasattr(self, 'pitch'):
-                new = self.copy()
+                new = self.thaw()
                 new.pitch += o
-                return new
+                return self._result(new)
             else:
                 return self.copy()
         raise TypeError(
@@ -113,9 +479,9 @@ class AbstractEvent(metaclass=EventMetaclass):
         # TODO: remove final else
         if isinstance(o, int):
             if hasattr(self, 'velocity'):
-                new = self.copy()
+                new = self.thaw()
                 new.velocity += o
-                return new
+                return self._result(new)
             else:
                 return self.copy()
         raise TypeError(
@@ -132,9 +498,9 @@ class AbstractEvent(metaclass=EventMetaclass):
         if o <= 0:
             raise TypeError(f"multiplication factor must be greater than zero")
         elif (isinstance(o, int) or isinstance(o, float)) and o > 0:
-            new = self.copy()
+            new = self.thaw()
             new.tick *= o
-            return new
+            return self._result(new)
         raise TypeError(
                 f"unsupported operand type(s) for +: '{self.__class__}' and '{type(o)}'")
 
@@ -148,7 +514,9 @@ class AbstractEvent(metaclass=EventMetaclass):
 
 
 class Event(AbstractEvent):
+    __slots__ = ('channel',)
     name = 'Event'
+    sort_priority = 2
 
     def __init__(self, channel=0, tick=0, data=[], **kw):
         super(Event, self).__init__(tick, data)
@@ -163,22 +531,29 @@ class Event(AbstractEvent):
                 return 0
             else:
                 return 127
-        new = self.copy()
-        new.data = list(map(quantize, self.data))
-        return new
+        new = self.thaw()
+        new.data = list(map(quantize, self._data))
+        return self._result(new)
 
     def copy(self):
-        return self.__class__(channel=self.channel, tick=self.tick, data=self.data.copy())
+        return self.__class__(channel=self.channel, tick=self.tick, data=self._data)
 
-    def __lt__(self, other):
-        return (super(Event, self).__lt__(other) or
-                (super(Event, self).__eq__(other) and
-                 self.channel < other.channel))
+    def _getstate(self):
+        return self.channel
+
+    def _setstate(self, state):
+        self.channel = state
+
+    def _sort_rank(self):
+        return (self.sort_priority, self.channel, tuple(self._data))
 
     def __eq__(self, other):
         return (super(Event, self).__eq__(other) and
                 self.channel == other.channel)
 
+    def _key(self):
+        return super(Event, self)._key() + (self.channel,)
+
     def __repr__(self):
         return self._baserepr(['channel'])
 
@@ -186,6 +561,35 @@ class Event(AbstractEvent):
     def is_event(cls, status):
         return (cls.status == (status & 0xF0))
 
+    @classmethod
+    def read_at(cls, tick, status, view, offset):
+        stop = offset + cls.length
+        if stop > len(view):
+            raise IndexError('MIDI event runs past end of track')
+        # system messages (0xF0 and up) have no channel
+        channel = status & 0xF if status < 0xF0 else 0
+        return cls(tick=tick, channel=channel,
+                   data=view[offset:stop].tobytes()), stop
+
+    @classmethod
+    def skip_at(cls, view, offset):
+        stop = offset + cls.length
+        if stop > len(view):
+            raise IndexError('MIDI event runs past end of track')
+        return stop
+
+    def write_to(self, buf, running_status=None):
+        status = self.status | self.channel
+        if status != running_status:
+            buf.append(status)
+        data = self._data
+        # quantize data bytes to 7-bit values, as _truncate
+        if data.__class__ is not bytes or (data and max(data) > 127):
+            data = [min(max(x, 0), 127) for x in data]
+        buf.extend(data)
+        # only channel statuses run on; system events cancel running status
+        return status if status < 0xF0 else None
+
 
 class MetaEvent(AbstractEvent):
     '''
@@ -194,14 +598,18 @@ class MetaEvent(AbstractEvent):
     as the Meta events.
     '''
 
+    __slots__ = ('_metacommand',)
     status = 0xFF
     metacommand = 0x0
     name = 'Meta Event'
+    sort_priority = 0
 
     def __init__(self, tick=0, data=[], metacommand=None):
         super(MetaEvent, self).__init__(tick, data)
-        if metacommand:
-            self.metacommand = metacommand
+        # registered subclasses carry their metacommand on the class, which
+        # an explicit one overrides
+        self._metacommand = (None if metacommand == self._class_metacommand
+                             else metacommand)
 
     @classmethod
     def is_event(cls, status):
@@ -209,7 +617,52 @@ class MetaEvent(AbstractEvent):
 
     def copy(self):
         return self.__class__(metacommand=self.metacommand, tick=self.tick,
-                              data=self.data.copy())
+                              data=self._data)
+
+    def __eq__(self, other):
+        return (super(MetaEvent, self).__eq__(other) and
+                self.metacommand == other.metacommand)
+
+    def _key(self):
+        return super(MetaEvent, self)._key() + (self.metacommand,)
+
+    def _getstate(self):
+        return self._metacommand
+
+    def _setstate(self, state):
+        self._metacommand = state
+
+    @classmethod
+    def read_at(cls, tick, status, view, offset):
+        metacommand = view[offset]
+        if metacommand not in EventRegistry.MetaEvents:
+            warn('Unknown Meta MIDI Event: ' + str(metacommand), Warning)
+            cls = UnknownMetaEvent
+        else:
+            cls = EventRegistry.MetaEvents[metacommand]
+        length, offset = read_varlen_at(view, offset + 1)
+        stop = offset + length
+        if stop > len(view):
+            raise IndexError('Meta event runs past end of track')
+        data = view[offset:stop].tobytes()
+        return cls(tick=tick, data=data, metacommand=metacommand), stop
+
+    @classmethod
+    def skip_at(cls, view, offset):
+        length, offset = read_varlen_at(view, offset + 1)
+        stop = offset + length
+        if stop > len(view):
+            raise IndexError('Meta event runs past end of track')
+        return stop
+
+    def write_to(self, buf, running_status=None):
+        # meta events cancel running status
+        data = self._data
+        buf.append(self.status)
+        buf.append(self.metacommand)
+        buf += write_varlen(len(data))
+        buf.extend(data)
+        return None
 
 
 class NoteEvent(Event):
@@ -229,29 +682,51 @@ class NoteEvent(Event):
 
     @property
     def pitch(self):
-        return self.data[0]
+        return self._data[0]
 
     @pitch.setter
     def pitch(self, val):
-        self.data[0] = val
+        self._set_datum(0, val)
 
     @property
     def velocity(self):
-        return self.data[1]
+        return self._data[1]
 
     @velocity.setter
     def velocity(self, val):
-        self.data[1] = val
+        self._set_datum(1, val)
+
+    def _alsa_note(self, seqev):
+        seqev.data.note.channel = self.channel
+        seqev.data.note.note = self.pitch
+        seqev.data.note.velocity = self.velocity
+        return True
 
 
 class NoteOnEvent(NoteEvent):
     status = 0x90
     name = 'Note On'
+    sort_priority = 4
+
+    def _sort_rank(self):
+        # without velocity, a note on ends a note
+        priority = (self.sort_priority if self._data[1]
+                    else NoteOffEvent.sort_priority)
+        return (priority, self.channel, tuple(self._data))
+
+    def alsa_write(self, seqev, alsa, queue):
+        seqev.type = alsa.SND_SEQ_EVENT_NOTEON
+        return self._alsa_note(seqev)
 
 
 class NoteOffEvent(NoteEvent):
     status = 0x80
     name = 'Note Off'
+    sort_priority = 3
+
+    def alsa_write(self, seqev, alsa, queue):
+        seqev.type = alsa.SND_SEQ_EVENT_NOTEOFF
+        return self._alsa_note(seqev)
 
 
 class AfterTouchEvent(Event):
@@ -268,19 +743,19 @@ class AfterTouchEvent(Event):
 
     @property
     def pitch(self):
-        return self.data[0]
+        return self._data[0]
 
     @pitch.setter
     def pitch(self, val):
-        self.data[0] = val
+        self._set_datum(0, val)
 
     @property
     def value(self):
-        return self.data[1]
+        return self._data[1]
 
     @value.setter
     def value(self, val):
-        self.data[1] = val
+        self._set_datum(1, val)
 
 
 class ControlChangeEvent(Event):
@@ -297,19 +772,26 @@ class ControlChangeEvent(Event):
 
     @property
     def control(self):
-        return self.data[0]
+        return self._data[0]
 
     @control.setter
     def control(self, val):
-        self.data[0] = val
+        self._set_datum(0, val)
 
     @property
     def value(self):
-        return self.data[1]
+        return self._data[1]
 
     @value.setter
     def value(self, val):
-        self.data[1] = val
+        self._set_datum(1, val)
+
+    def alsa_write(self, seqev, alsa, queue):
+        seqev.type = alsa.SND_SEQ_EVENT_CONTROLLER
+        seqev.data.control.channel = self.channel
+        seqev.data.control.param = self.control
+        seqev.data.control.value = self.value
+        return True
 
 
 class ProgramChangeEvent(Event):
@@ -324,11 +806,17 @@ class ProgramChangeEvent(Event):
 
     @property
     def value(self):
-        return self.data[0]
+        return self._data[0]
 
     @value.setter
     def value(self, val):
-        self.data[0] = val
+        self._set_datum(0, val)
+
+    def alsa_write(self, seqev, alsa, queue):
+        seqev.type = alsa.SND_SEQ_EVENT_PGMCHANGE
+        seqev.data.control.channel = self.channel
+        seqev.data.control.value = self.value
+        return True
 
 
 class ChannelAfterTouchEvent(Event):
@@ -343,11 +831,11 @@ class ChannelAfterTouchEvent(Event):
 
     @property
     def value(self):
-        return self.data[1]
+        return self._data[0]
 
     @value.setter
     def value(self, val):
-        self.data[1] = val
+        self._set_datum(0, val)
 
 
 class PitchWheelEvent(Event):
@@ -362,24 +850,49 @@ class PitchWheelEvent(Event):
 
     @property
     def pitch(self):
-        return ((self.data[1] << 7) | self.data[0]) - 0x2000
+        return ((self._data[1] << 7) | self._data[0]) - 0x2000
 
     @pitch.setter
     def pitch(self, pitch):
         value = pitch + 0x2000
-        self.data[0] = value & 0x7F
-        self.data[1] = (value >> 7) & 0x7F
+        self.data = [value & 0x7F, (value >> 7) & 0x7F]
+
+    def alsa_write(self, seqev, alsa, queue):
+        seqev.type = alsa.SND_SEQ_EVENT_PITCHBEND
+        seqev.data.control.channel = self.channel
+        seqev.data.control.value = self.pitch
+        return True
 
 
 class SysexEvent(Event):
     status = 0xF0
     name = 'SysEx'
+    sort_priority = 1
     length = 'varlen'
 
     @classmethod
     def is_event(cls, status):
         return (cls.status == status)
 
+    @classmethod
+    def read_at(cls, tick, status, view, offset):
+        stop = cls.skip_at(view, offset) - 1
+        return cls(tick=tick, data=view[offset:stop].tobytes()), stop + 1
+
+    @classmethod
+    def skip_at(cls, view, offset):
+        # 0xF7 signals end of Sysex data stream
+        while view[offset] != 0xF7:
+            offset += 1
+        return offset + 1
+
+    def write_to(self, buf, running_status=None):
+        buf.append(self.status)
+        buf.extend(self._data)
+        buf.append(0xF7)
+        # as does sysex
+        return None
+
 
 class SequenceNumberMetaEvent(MetaEvent):
     name = 'Sequence Number'
@@ -391,17 +904,18 @@ class MetaEventWithText(MetaEvent):
     '''
     Subclass of MetaEvent for events with text
     '''
+    __slots__ = ('_text',)
 
     def __init__(self, text=None, tick=0, data=[], **kw):
-        super(MetaEventWithText, self).__init__(**kw)
+        super(MetaEventWithText, self).__init__(tick, data, **kw)
+        self._text = None
         if text is not None:
             self.text = text
-        self._text = None
 
     @property
     def text(self):
         if self._text is None:
-            self._text = ''.join(chr(datum) for datum in self.data)
+            self._text = ''.join(chr(datum) for datum in self._data)
         return self._text
 
     @text.setter
@@ -410,6 +924,15 @@ class MetaEventWithText(MetaEvent):
         self.data = bytearray(ord(c) for c in text)
         self._text = None
 
+    def _setstate(self, state):
+        super(MetaEventWithText, self)._setstate(state)
+        self._text = None
+
+    @AbstractEvent.data.setter
+    def data(self, data):
+        AbstractEvent.data.fset(self, data)
+        self._text = None
+
     def __repr__(self):
         return self._baserepr(['text'])
 
@@ -464,13 +987,11 @@ class ProgramNameEvent(MetaEventWithText):
 
 class UnknownMetaEvent(MetaEvent):
     name = 'Unknown'
-    # This class variable must be overriden by code calling the constructor,
-    # which sets a local variable of the same name to shadow the class variable.
+    # set per instance by code calling the constructor
     metacommand = None
 
     def __init__(self, metacommand=None, tick=0, data=[]):
-        super(UnknownMetaEvent, self).__init__(tick, data)
-        self.metacommand = metacommand
+        super(UnknownMetaEvent, self).__init__(tick, data, metacommand)
 
 
 class ChannelPrefixEvent(MetaEvent):
@@ -492,6 +1013,10 @@ class TrackLoopEvent(MetaEvent):
 class EndOfTrackEvent(MetaEvent):
     name = 'End of Track'
     metacommand = 0x2F
+    sort_priority = 5
+
+    def alsa_write(self, seqev, alsa, queue):
+        return None
 
 
 class SetTempoEvent(MetaEvent):
@@ -517,14 +1042,22 @@ class SetTempoEvent(MetaEvent):
 
     @property
     def mpqn(self):
-        assert(len(self.data) == 3)
-        vals = [self.data[x] << (16 - (8 * x)) for x in range(3)]
+        assert(len(self._data) == 3)
+        vals = [self._data[x] << (16 - (8 * x)) for x in range(3)]
         return sum(vals)
 
     @mpqn.setter
     def mpqn(self, val):
         self.data = [(val >> (16 - (8 * x)) & 0xFF) for x in range(3)]
 
+    def alsa_write(self, seqev, alsa, queue):
+        seqev.type = alsa.SND_SEQ_EVENT_TEMPO
+        seqev.dest.client = alsa.SND_SEQ_CLIENT_SYSTEM
+        seqev.dest.port = alsa.SND_SEQ_PORT_SYSTEM_TIMER
+        seqev.data.queue.queue = queue
+        seqev.data.queue.param.value = int(60.0 * 1000000.0 / self.bpm)
+        return True
+
 
 class SmpteOffsetEvent(MetaEvent):
     name = 'SMPTE Offset'
@@ -550,35 +1083,35 @@ class TimeSignatureEvent(MetaEvent):
 
     @property
     def numerator(self):
-        return self.data[0]
+        return self._data[0]
 
     @numerator.setter
     def numerator(self, val):
-        self.data[0] = val
+        self._set_datum(0, val)
 
     @property
     def denominator(self):
-        return 2 ** self.data[1]
+        return 2 ** self._data[1]
 
     @denominator.setter
     def denominator(self, val):
-        self.data[1] = int(math.log(val, 2))
+        self._set_datum(1, int(math.log(val, 2)))
 
     @property
     def metronome(self):
-        return self.data[2]
+        return self._data[2]
 
     @metronome.setter
     def metronome(self, val):
-        self.data[2] = val
+        self._set_datum(2, val)
 
     @property
     def thirty_seconds(self):
-        return self.data[3]
+        return self._data[3]
 
     @thirty_seconds.setter
     def thirty_seconds(self, val):
-        self.data[3] = val
+        self._set_datum(3, val)
 
 
 class KeySignatureEvent(MetaEvent):
@@ -596,20 +1129,20 @@ class KeySignatureEvent(MetaEvent):
 
     @property
     def alternatives(self):
-        d = self.data[0]
+        d = self._data[0]
         return d - 256 if d > 127 else d
 
     @alternatives.setter
     def alternatives(self, val):
-        self.data[0] = 256 + val if val < 0 else val
+        self._set_datum(0, 256 + val if val < 0 else val)
 
     @property
     def minor(self):
-        return self.data[1]
+        return self._data[1]
 
     @minor.setter
     def minor(self, val):
-        self.data[1] = val
+        self._set_datum(1, val)
 
 
 class SequencerSpecificEvent(MetaEvent):
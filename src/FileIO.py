@@ -3,23 +3,39 @@ Classes for reading and writing MIDI files
 
 TODO: add checking for tick resolution, since some events might occur at a relative tick value that overflows
 '''
+import mmap
+import shutil
+import tempfile
+from collections import namedtuple
+from io import BytesIO
 from warnings import warn
-from struct import unpack, pack
-from .Util import read_varlen, write_varlen
+from struct import unpack, pack, pack_into
+from .Util import read_varlen, read_varlen_at, write_varlen
 from .Constants import DEFAULT_MIDI_HEADER_SIZE, CHUNK_SIZE, HEADER_SIZE, MAX_TICK_RESOLUTION
-from .Containers import Track, Pattern
-from .Events import MetaEvent, SysexEvent, EventRegistry, UnknownMetaEvent, Event
+from .Containers import Track, Pattern, LazyPattern, PatternPipeline, _events
+from .Arrays import ArrayPattern, ArrayTrack
+from .Events import MetaEvent, SysexEvent, EventRegistry, UnknownMetaEvent, \
+    TrackNameEvent, SetTempoEvent, TimeSignatureEvent, KeySignatureEvent
 
 
 class FileReader(object):
+    # whether some events are left out of the tracks read
+    filtering = False
 
     def read(self, buffer):
         '''
-        Read a midi file from a buffer and return a Pattern object
+        Read a midi file from a buffer and return a Pattern object. Each track
+        keeps its raw chunk, which FileWriter copies verbatim until the track
+        is modified
         '''
         pattern = self.parse_file_header(buffer)
         for track in pattern:
-            track += self.parse_track(buffer)
+            data = buffer.read(self.parse_track_header(buffer))
+            # the events are owned by the track, nothing else refers to them
+            list.extend(track, self.parse_track_data(data))
+            track._whole = True
+            if not self.filtering:
+                track._raw = bytes(data)
         return pattern
 
     def parse_file_header(self, buffer):
@@ -43,9 +59,13 @@ class FileReader(object):
 
     def parse_track(self, buffer):
         '''Parse a MIDI track into a tuple of events'''
-        self.running_status = None
         track_size = self.parse_track_header(buffer)
-        track_data = iter(buffer.read(track_size))
+        return self.parse_track_data(buffer.read(track_size))
+
+    def parse_track_data(self, data):
+        '''Parse the body of an MTrk chunk into a tuple of events'''
+        self.running_status = None
+        track_data = iter(data)
         events = []
         while track_data:
             try:
@@ -69,13 +89,14 @@ class FileReader(object):
         Returns a MidiEvent, SysexEvent, or MetaEvent, or subclass thereof'''
         tick = read_varlen(track_iter)
         header_byte = next(track_iter)
-        if SysexEvent.is_event(header_byte):
+        cls = EventRegistry.Dispatch[header_byte]
+        if cls is SysexEvent:
             return self.parse_sysex_event(tick, track_iter)
-        elif MetaEvent.is_event(header_byte):
+        elif cls is MetaEvent:
             return self.parse_meta_event(tick, track_iter)
         return self.parse_midi_event(tick, header_byte, track_iter)
 
-    def parse_sysex_event(tick, track_iter):
+    def parse_sysex_event(self, tick, track_iter):
         '''
         Return a SysexEvent object given a tick and track_iter byte iterator
         '''
@@ -105,36 +126,185 @@ class FileReader(object):
         '''
         Parse and return a standard MIDI event
         '''
-        key = header_byte & 0xF0
-        # if this key isn't an event, it's data for an event of
+        cls = EventRegistry.Dispatch[header_byte]
+        # if this byte isn't a status, it's data for an event of
         # the same time we just parsed
-        if key not in EventRegistry.Events:
+        if cls is None:
+            if header_byte & 0x80:
+                raise ValueError("Unknown MIDI Event status: " +
+                                 str(header_byte))
             assert self.running_status, 'Bad byte value'
             data = []
-            key = self.running_status & 0xF0
-            cls = EventRegistry.Events[key]
+            cls = EventRegistry.Dispatch[self.running_status]
             channel = self.running_status & 0xF
             data.append(header_byte)
             data += [next(track_iter) for x in range(cls.length - 1)]
             return cls(tick=tick, channel=channel, data=data)
         else:
             self.running_status = header_byte
-            cls = EventRegistry.Events[key]
             channel = self.running_status & 0xF
             data = [next(track_iter) for x in range(cls.length)]
             return cls(tick=tick, channel=channel, data=data)
         raise Warning("Uknown midi event: " + str(header_byte))
 
 
+class CursorFileReader(FileReader):
+    '''
+    FileReader that walks each track with an integer offset over a memoryview,
+    decoding varlens and payloads by slicing instead of calling next() once
+    per byte. Produces the same events as FileReader.
+
+    include and exclude are optional event classes (or iterables of them) to
+    keep or drop, subclasses included. Dropped events are stepped over without
+    being constructed, and their delta ticks carry into the next kept event.
+    '''
+
+    def __init__(self, include=None, exclude=None):
+        self.include = None if include is None else self._classes(include)
+        self.exclude = None if exclude is None else self._classes(exclude)
+        # keep/drop decision by event class, filled in as classes are met
+        self._keeps = {}
+
+    @staticmethod
+    def _classes(classes):
+        if isinstance(classes, type):
+            return (classes,)
+        return tuple(classes)
+
+    @property
+    def filtering(self):
+        return self.include is not None or self.exclude is not None
+
+    def keeps(self, cls):
+        '''Whether events of class cls pass the include and exclude filters'''
+        keep = self._keeps.get(cls)
+        if keep is None:
+            keep = ((self.include is None or issubclass(cls, self.include)) and
+                    (self.exclude is None or not issubclass(cls, self.exclude)))
+            self._keeps[cls] = keep
+        return keep
+
+    def keep_tables(self):
+        '''
+        Return whether events pass the filters, as lists indexed by status
+        byte and, for meta events, by metacommand
+        '''
+        statuses = [cls is None or self.keeps(cls)
+                    for cls in EventRegistry.Dispatch]
+        metas = [self.keeps(EventRegistry.MetaEvents.get(metacommand,
+                                                         UnknownMetaEvent))
+                 for metacommand in range(0x100)]
+        return statuses, metas
+
+    def parse_track_data(self, data):
+        '''Parse the body of an MTrk chunk into a tuple of events'''
+        return tuple(self.iter_track_data(data))
+
+    def iter_events(self, buffer, absolute=False):
+        '''
+        Yield (track index, event) tuples from a midi file buffer, reading a
+        single track chunk into memory at a time. If absolute is True, event
+        ticks are absolute rather than relative to the previous event.
+        '''
+        header = self.parse_file_header(buffer)
+        for index in range(len(header)):
+            track_size = self.parse_track_header(buffer)
+            abstick = 0
+            for event in self.iter_track_data(buffer.read(track_size)):
+                if absolute:
+                    abstick += event.tick
+                    event.tick = abstick
+                yield index, event
+
+    def iter_track_data(self, data):
+        '''
+        Yield events from the body of an MTrk chunk. data may be any object
+        supporting the buffer protocol (bytes, bytearray, mmap...)
+        '''
+        self.running_status = None
+        dispatch = EventRegistry.Dispatch
+        filtering = self.filtering
+        if filtering:
+            kept, kept_metas = self.keep_tables()
+        # delta ticks of dropped events, owed to the next kept event
+        carry = 0
+        with memoryview(data) as view:
+            end = len(view)
+            offset = 0
+            while offset < end:
+                try:
+                    # channel events are decoded inline, as they make up the
+                    # bulk of most tracks
+                    tick = view[offset]
+                    if tick & 0x80:
+                        tick, offset = read_varlen_at(view, offset)
+                    else:
+                        offset += 1
+                    header_byte = view[offset]
+                    if header_byte < 0xF0:
+                        if header_byte & 0x80:
+                            self.running_status = header_byte
+                            offset += 1
+                        else:
+                            assert self.running_status, 'Bad byte value'
+                        cls = dispatch[self.running_status]
+                        stop = offset + cls.length
+                        if stop > end:
+                            break
+                        if filtering and not kept[self.running_status]:
+                            carry += tick
+                            offset = stop
+                            continue
+                        event = cls(tick=tick,
+                                    channel=self.running_status & 0xF,
+                                    data=view[offset:stop].tobytes())
+                        offset = stop
+                    else:
+                        cls = dispatch[header_byte]
+                        if cls is None:
+                            # a system status no class is registered for
+                            raise ValueError("Unknown MIDI Event status: " +
+                                             str(header_byte))
+                        if filtering:
+                            if header_byte == MetaEvent.status:
+                                if not kept_metas[view[offset + 1]]:
+                                    # step over the payload by its length
+                                    size = view[offset + 2]
+                                    offset += 3
+                                    if size & 0x80:
+                                        size, offset = read_varlen_at(
+                                            view, offset - 1)
+                                    offset += size
+                                    if offset > end:
+                                        break
+                                    carry += tick
+                                    continue
+                            elif not kept[header_byte]:
+                                offset = cls.skip_at(view, offset + 1)
+                                carry += tick
+                                continue
+                        event, offset = cls.read_at(
+                            tick, header_byte, view, offset + 1)
+                except IndexError:
+                    # the last event was truncated; drop it like FileReader
+                    break
+                if carry:
+                    event.tick += carry
+                    carry = 0
+                yield event
+
+
 class FileWriter(object):
     def write(self, midifile, pattern):
+        if isinstance(pattern, PatternPipeline):
+            pattern = pattern.materialize()
+        pattern = self.check_resolution(pattern)
         self.write_file_header(midifile, pattern)
         for track in pattern:
             self.write_track(midifile, track)
 
     def write_file_header(self, midifile, pattern):
         # First four bytes are MIDI header
-        pattern = self.check_resolution(pattern)
         packdata = pack(">LHHH", 6,
                         pattern.format,
                         len(pattern),
@@ -142,59 +312,113 @@ class FileWriter(object):
         midifile.write(b'MThd%s' % packdata)
 
     def check_resolution(self, pattern):
-        '''Check if any tick values '''
-        if self.check_float(pattern):
-            pattern.resolution = MAX_TICK_RESOLUTION
-            coeff = MAX_TICK_RESOLUTION / pattern.resolution
-            for track in pattern:
-                for event in track:
-                    event.data = list(
-                        map(lambda x: int(x * coeff + .5), event.data))
-                    event.tick = int(event.tick * coeff + .5)
+        '''
+        Return the pattern to write. If some ticks or data aren't whole
+        numbers, that is a quantized copy; the pattern itself is left as is.
+        Floats are quantized at the maximum resolution. Fractions only, as
+        left by setting the resolution (see Pattern.resolution), are quantized
+        at the resolution of the pattern, which is the one it was set to
+        '''
+        kinds = self.check_float(pattern)
+        if kinds:
+            pattern = pattern.copy()
+            if float in kinds:
+                pattern.resolution = MAX_TICK_RESOLUTION
+            pattern.quantize()
         return pattern
 
     def check_float(self, pattern):
-        return any(isinstance(datum, float)
-                   for track in pattern
-                   for event in track
-                   for datum in [event.tick] + event.data)
+        '''Return the set of types of the ticks and data that aren't ints'''
+        # ArrayTracks, unmodified and quantized tracks only hold whole numbers
+        return {type(datum)
+                for track in pattern
+                if not (isinstance(track, ArrayTrack) or
+                        track._raw is not None or track._whole)
+                for event in _events(track)
+                for datum in [event.tick, *event._data]
+                if type(datum) is not int}
 
     def write_track(self, midifile, track):
-        buf = b''
-        self.running_status = None
-        for event in track:
-            buf += self.encode_event(event)
-        buf = self.encode_track_header(len(buf)) + buf
+        raw = getattr(track, '_raw', None)
+        if raw is not None:
+            # the track is unmodified since it was read: copy its chunk
+            midifile.write(self.encode_track_header(len(raw)))
+            midifile.write(raw)
+            return
+        # encode the whole chunk into one buffer, then backpatch its length
+        buf = bytearray(self.encode_track_header(0))
+        if isinstance(track, ArrayTrack):
+            self.encode_array_track(track, buf)
+        else:
+            self.running_status = None
+            encode_event = self.encode_event
+            for event in _events(track):
+                encode_event(event, buf)
+        pack_into(">L", buf, CHUNK_SIZE, len(buf) - CHUNK_SIZE - 4)
         midifile.write(buf)
 
     def encode_track_header(self, trklen):
         return b'MTrk%s' % pack(">L", trklen)
 
-    def encode_event(self, event):
-        ret = write_varlen(event.tick)
-        # is the event a MetaEvent?
-        if isinstance(event, MetaEvent):
-            ret += bytearray([event.status]) + bytearray([event.metacommand])
-            ret += write_varlen(len(event.data))
-            ret += b''.join(map(lambda x: bytearray([x]), event.data))
-        # is this event a Sysex Event?
-        elif isinstance(event, SysexEvent):
-            ret += bytearray([0xF0])
-            ret += b''.join(map(lambda x: bytearray([x]), event.data))
-            ret += bytearray([0xF7])
-        # not a Meta MIDI event or a Sysex event, must be a general message
-        elif isinstance(event, Event):
-            if not self.running_status or \
-                    self.running_status.status != event.status or \
-                    self.running_status.channel != event.channel:
-                self.running_status = event
-                ret += bytearray([event.status | event.channel])
-            event = event._truncate()
-            ret += b''.join(map(lambda x: bytearray([x]), event.data))
-        else:
-            raise ValueError("Unknown MIDI Event: " + str(event))
-        return ret
+    def encode_array_track(self, track, buf=None):
+        '''
+        Encode the columns of an ArrayTrack as the body of an MTrk chunk,
+        appending to buf if given. Returns the buffer
+        '''
+        if buf is None:
+            buf = bytearray()
+        running_status = None
+        payload = track.payload
+        for i, tick in enumerate(track.tick):
+            if tick < 0x80:
+                buf.append(tick)
+            else:
+                buf += write_varlen(tick)
+            status = track.status[i]
+            if status == MetaEvent.status or status == SysexEvent.status:
+                start = track.offset[i]
+                size = track.size[i]
+                if status == MetaEvent.status:
+                    buf.append(status)
+                    buf.append(track.data1[i])
+                    buf += write_varlen(size)
+                    buf += payload[start:start + size]
+                else:
+                    buf.append(status)
+                    buf += payload[start:start + size]
+                    buf.append(0xF7)
+                # meta and sysex events cancel running status
+                running_status = None
+                continue
+            if running_status != status | track.channel[i]:
+                running_status = status | track.channel[i]
+                buf.append(running_status)
+            if status >= 0xF0:
+                # as do system events
+                running_status = None
+            # quantize data bytes to 7-bit values, as Event._truncate
+            buf.append(min(max(track.data1[i], 0), 127))
+            if EventRegistry.Dispatch[status].length > 1:
+                buf.append(min(max(track.data2[i], 0), 127))
+        return buf
 
+    def encode_event(self, event, buf=None):
+        '''
+        Encode an event, appending to buf if given. Returns the buffer
+        '''
+        try:
+            write_to = event.write_to
+        except AttributeError:
+            raise ValueError("Unknown MIDI Event: " + str(event))
+        if buf is None:
+            buf = bytearray()
+        tick = event.tick
+        if tick < 0x80:
+            buf.append(tick)
+        else:
+            buf += write_varlen(tick)
+        self.running_status = write_to(buf, self.running_status)
+        return buf
 
 def write_midifile(filename, pattern):
     with open(filename, 'wb') as f:
@@ -202,7 +426,472 @@ def write_midifile(filename, pattern):
         return writer.write(f, pattern)
 
 
-def read_midifile(filename):
+class MidiStreamWriter(FileWriter):
+    '''
+    Context manager that writes a MIDI file event by event, without building a
+    Pattern. The MThd header is written up front; the track count and each
+    MTrk length are patched by seeking back once they are known. Outputs that
+    can't seek are spooled to a temporary file and copied over on close.
+
+        with MidiStreamWriter('out.mid', resolution=480) as writer:
+            writer.new_track()
+            writer.append(NoteOnEvent(tick=0, pitch=60))
+            writer.extend(events)
+
+    Event ticks are relative to the previous event of the track.
+    '''
+    # bytes encoded before they are handed to the output
+    flush_size = 1 << 16
+
+    def __init__(self, output, resolution=220, fmt=1):
+        self._owned = isinstance(output, str)
+        if self._owned:
+            output = open(output, 'wb')
+        self.output = output
+        seekable = getattr(output, 'seekable', None)
+        if seekable is not None and seekable():
+            self.file = output
+        else:
+            self.file = tempfile.TemporaryFile()
+        self.num_tracks = 0
+        self.closed = False
+        self.running_status = None
+        self._track_start = None
+        self._buf = bytearray()
+        self._header_start = self.file.tell()
+        self.file.write(b'MThd%s' % pack(">LHHH", 6, fmt, 0, resolution))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def new_track(self):
+        '''End the current track, if any, and start writing a new one'''
+        assert not self.closed, "Writer is closed"
+        self.end_track()
+        self._track_start = self.file.tell()
+        self.file.write(self.encode_track_header(0))
+        self.running_status = None
+        self.num_tracks += 1
+
+    def append(self, event):
+        '''Write an event to the current track'''
+        assert self._track_start is not None, "No track to write to"
+        self.encode_event(event, self._buf)
+        if len(self._buf) >= self.flush_size:
+            self._flush()
+
+    def extend(self, events):
+        '''Write an iterable of events to the current track'''
+        append = self.append
+        for event in _events(events):
+            append(event)
+
+    def end_track(self):
+        '''Finish the current track, patching its MTrk length'''
+        if self._track_start is None:
+            return
+        self._flush()
+        end = self.file.tell()
+        self.file.seek(self._track_start + CHUNK_SIZE)
+        self.file.write(pack(">L", end - self._track_start - CHUNK_SIZE - 4))
+        self.file.seek(end)
+        self._track_start = None
+
+    def close(self):
+        '''Finish the file, patching its track count'''
+        if self.closed:
+            return
+        self.end_track()
+        end = self.file.tell()
+        # the track count follows the chunk id, header size and format
+        self.file.seek(self._header_start + CHUNK_SIZE + 6)
+        self.file.write(pack(">H", self.num_tracks))
+        self.file.seek(end)
+        if self.file is not self.output:
+            self.file.seek(self._header_start)
+            shutil.copyfileobj(self.file, self.output)
+            self.file.close()
+        self.closed = True
+        if self._owned:
+            self.output.close()
+
+    def _flush(self):
+        self.file.write(self._buf)
+        self._buf.clear()
+
+
+class ArrayFileReader(CursorFileReader):
+    '''
+    CursorFileReader that decodes tracks straight into the columns of an
+    ArrayPattern, without constructing Event objects
+    '''
+
+    def read(self, buffer):
+        '''
+        Read a midi file from a buffer and return an ArrayPattern object
+        '''
+        header = self.parse_file_header(buffer)
+        self.pattern = ArrayPattern(resolution=header.resolution,
+                                    fmt=header.format)
+        for _ in header:
+            self.parse_track(buffer)
+        return self.pattern
+
+    def parse_track_data(self, data):
+        '''
+        Decode the body of an MTrk chunk into a new ArrayTrack of self.pattern
+        '''
+        track = self.pattern.new_track()
+        payload = track.payload
+        # bound appends for each column, in ArrayTrack column order
+        (tick_append, abstick_append, status_append, channel_append,
+         data1_append, data2_append, offset_append, size_append) = \
+            (column.append for column in track.columns.values())
+        abstick = 0
+        self.running_status = None
+        dispatch = EventRegistry.Dispatch
+        with memoryview(data) as view:
+            end = len(view)
+            offset = 0
+            while offset < end:
+                try:
+                    tick, offset = read_varlen_at(view, offset)
+                    header_byte = view[offset]
+                    if header_byte < 0xF0 or (
+                            header_byte != SysexEvent.status and
+                            header_byte != MetaEvent.status):
+                        if header_byte < 0xF0:
+                            if header_byte & 0x80:
+                                self.running_status = header_byte
+                                offset += 1
+                            else:
+                                assert self.running_status, 'Bad byte value'
+                            status = self.running_status & 0xF0
+                            channel = self.running_status & 0xF
+                        else:
+                            # a system event, decoded into the data columns
+                            # if a class is registered for its status
+                            if dispatch[header_byte] is None:
+                                raise ValueError(
+                                    "Unknown MIDI Event status: " +
+                                    str(header_byte))
+                            status = header_byte
+                            channel = 0
+                            offset += 1
+                        stop = offset + dispatch[status].length
+                        if stop > end:
+                            break
+                        data1 = view[offset] if stop > offset else 0
+                        data2 = view[offset + 1] if stop - offset > 1 else 0
+                        offset = stop
+                        abstick += tick
+                        tick_append(tick)
+                        abstick_append(abstick)
+                        status_append(status)
+                        channel_append(channel)
+                        data1_append(data1)
+                        data2_append(data2)
+                        offset_append(0)
+                        size_append(0)
+                        continue
+                    elif header_byte == SysexEvent.status:
+                        start = offset = offset + 1
+                        # 0xF7 signals end of Sysex data stream
+                        while view[offset] != 0xF7:
+                            offset += 1
+                        stop = offset
+                        offset += 1
+                        metacommand = 0
+                    else:
+                        metacommand = view[offset + 1]
+                        if metacommand not in EventRegistry.MetaEvents:
+                            warn('Unknown Meta MIDI Event: ' +
+                                 str(metacommand), Warning)
+                        length, start = read_varlen_at(view, offset + 2)
+                        offset = stop = start + length
+                        if stop > end:
+                            break
+                except IndexError:
+                    # the last event was truncated; drop it like FileReader
+                    break
+                abstick += tick
+                tick_append(tick)
+                abstick_append(abstick)
+                status_append(header_byte)
+                channel_append(0)
+                data1_append(metacommand)
+                data2_append(0)
+                offset_append(len(payload))
+                size_append(stop - start)
+                payload += view[start:stop]
+        return track
+
+
+class LazyFileReader(CursorFileReader):
+    '''
+    CursorFileReader that only records the offset and size of each MTrk chunk,
+    returning a LazyPattern that parses a track the first time it is accessed.
+    The buffer must stay readable for as long as the pattern is used.
+    '''
+
+    def read(self, buffer):
+        '''
+        Read the header and chunk table of a midi file from a seekable buffer
+        and return a LazyPattern object
+        '''
+        header = self.parse_file_header(buffer)
+        self.buffer = buffer
+        self.chunks = []
+        for _ in header:
+            size = self.parse_track_header(buffer)
+            self.chunks.append((buffer.tell(), size))
+            buffer.seek(size, 1)
+        return LazyPattern(self.load_track, len(self.chunks),
+                           resolution=header.resolution, fmt=header.format)
+
+    def load_track(self, index):
+        '''Parse the track stored in chunk index'''
+        offset, size = self.chunks[index]
+        if isinstance(self.buffer, mmap.mmap):
+            # parse straight from the mapping, without copying the chunk
+            with memoryview(self.buffer) as view:
+                events = self.parse_track_data(view[offset:offset + size])
+            data = self.buffer[offset:offset + size]
+        else:
+            self.buffer.seek(offset)
+            data = self.buffer.read(size)
+            events = self.parse_track_data(data)
+        track = Track._wrap(events)
+        track._whole = True
+        if not self.filtering:
+            track._raw = data
+        return track
+
+
+# Summary of a midi file returned by scan_midifile
+#   track_names: name of each track, or None if it has no TrackNameEvent
+#   tempos: (absolute tick, mpqn) of each SetTempoEvent
+#   time_signatures: (absolute tick, numerator, denominator)
+#   key_signatures: (absolute tick, alternatives, minor)
+#   total_ticks: length of the longest track in ticks
+#   event_counts: number of events by event class name
+MidiSummary = namedtuple('MidiSummary', [
+    'format', 'resolution', 'num_tracks', 'track_names', 'tempos',
+    'time_signatures', 'key_signatures', 'total_ticks', 'event_counts'])
+
+
+class ScanFileReader(CursorFileReader):
+    '''
+    Reader that walks the bytes of a midi file to summarize it. Events are
+    stepped over by status, and only the meta events the summary reports are
+    materialized, once for each distinct payload; all other events are
+    counted by status, or by metacommand for meta events.
+    '''
+
+    # the meta events the summary reports, rather than counted and skipped
+    summarized = (TrackNameEvent, SetTempoEvent, TimeSignatureEvent,
+                  KeySignatureEvent)
+
+    def read(self, buffer):
+        '''
+        Scan a midi file from a buffer and return a MidiSummary
+        '''
+        header = self.parse_file_header(buffer)
+        counts = [0] * 256
+        meta_counts = [0] * 256
+        track_names = []
+        metas = []
+        total_ticks = 0
+        # summarized meta events by metacommand and payload, shared between
+        # the events that repeat them
+        self.meta_events = {}
+        for _ in header:
+            size = self.parse_track_header(buffer)
+            ticks, track_metas = self.scan_track_data(buffer.read(size),
+                                                      counts, meta_counts)
+            total_ticks = max(total_ticks, ticks)
+            track_names.append(next((event.text for _, event in track_metas
+                                     if isinstance(event, TrackNameEvent)),
+                                    None))
+            metas.extend(track_metas)
+        metas.sort(key=lambda meta: meta[0])
+        event_counts = {}
+        for status, count in enumerate(counts):
+            if count:
+                name = EventRegistry.Events[status].__name__
+                event_counts[name] = count
+        for metacommand, count in enumerate(meta_counts):
+            if count:
+                name = EventRegistry.MetaEvents.get(
+                    metacommand, UnknownMetaEvent).__name__
+                event_counts[name] = event_counts.get(name, 0) + count
+        # what each distinct summarized event is reported as
+        reported = {SetTempoEvent: [], TimeSignatureEvent: [],
+                    KeySignatureEvent: []}
+        fields = {}
+        for event in self.meta_events.values():
+            if isinstance(event, SetTempoEvent):
+                kind, values = SetTempoEvent, (event.mpqn,)
+            elif isinstance(event, TimeSignatureEvent):
+                kind = TimeSignatureEvent
+                values = (event.numerator, event.denominator)
+            elif isinstance(event, KeySignatureEvent):
+                kind = KeySignatureEvent
+                values = (event.alternatives, event.minor)
+            else:
+                continue
+            fields[id(event)] = reported[kind], values
+        for tick, event in metas:
+            field = fields.get(id(event))
+            if field is not None:
+                field[0].append((tick,) + field[1])
+        return MidiSummary(
+            format=header.format,
+            resolution=header.resolution,
+            num_tracks=len(header),
+            track_names=track_names,
+            tempos=reported[SetTempoEvent],
+            time_signatures=reported[TimeSignatureEvent],
+            key_signatures=reported[KeySignatureEvent],
+            total_ticks=total_ticks,
+            event_counts=event_counts)
+
+    def scan_track_data(self, data, counts, meta_counts):
+        '''
+        Walk the body of an MTrk chunk, adding one to counts[status] for each
+        channel, sysex or system event and to meta_counts[metacommand] for
+        each meta event. Only the summarized classes are built, and of track
+        names only the first. Returns the length of the track in ticks and
+        a list of (absolute tick, meta event) tuples of the events built.
+
+        Channel events are stepped over by the data length of their class,
+        other events by their class's skip_at. As in CursorFileReader, only
+        channel statuses set the running status, which then carries over the
+        events stepped over.
+        '''
+        dispatch = EventRegistry.Dispatch
+        # data lengths of channel events indexed by status byte
+        lengths = [cls.length if cls is not None and status < 0xF0 else 0
+                   for status, cls in enumerate(dispatch)]
+        summarized = {cls.metacommand for cls in self.summarized}
+        known = EventRegistry.MetaEvents
+        meta_events = self.meta_events
+        running_status = None
+        metas = []
+        abstick = 0
+        with memoryview(data) as view:
+            end = len(view)
+            offset = 0
+            while offset < end:
+                try:
+                    tick = view[offset]
+                    if tick & 0x80:
+                        tick, offset = read_varlen_at(view, offset)
+                    else:
+                        offset += 1
+                    status = view[offset]
+                    if status < 0xF0:
+                        if status & 0x80:
+                            running_status = status
+                            offset += 1
+                        else:
+                            assert running_status, 'Bad byte value'
+                        offset += lengths[running_status]
+                        if offset > end:
+                            break
+                        abstick += tick
+                        counts[running_status & 0xF0] += 1
+                        continue
+                    cls = dispatch[status]
+                    if cls is None:
+                        raise ValueError("Unknown MIDI Event status: " +
+                                         str(status))
+                    stop = cls.skip_at(view, offset + 1)
+                except IndexError:
+                    # the last event was truncated; drop it like FileReader
+                    break
+                abstick += tick
+                if status != MetaEvent.status:
+                    counts[status] += 1
+                    offset = stop
+                    continue
+                metacommand = view[offset + 1]
+                meta_counts[metacommand] += 1
+                if metacommand in summarized:
+                    start = read_varlen_at(view, offset + 2)[1]
+                    key = (metacommand, view[start:stop].tobytes())
+                    event = meta_events.get(key)
+                    if event is None:
+                        event = meta_events[key] = known[metacommand](
+                            data=key[1])
+                    metas.append((abstick, event))
+                    if metacommand == TrackNameEvent.metacommand:
+                        # only the first name of a track is reported
+                        summarized = summarized - {metacommand}
+                elif metacommand not in known:
+                    warn('Unknown Meta MIDI Event: ' + str(metacommand),
+                         Warning)
+                offset = stop
+        return abstick, metas
+
+
+# parsing engines selectable from read_midifile
+READERS = {
+    'cursor': CursorFileReader,
+    'iter': FileReader,
+}
+
+
+def read_midifile(filename, engine='cursor', columnar=False, lazy=False,
+                  include=None, exclude=None):
+    '''
+    Read a MIDI file into a Pattern. If columnar is True, decode it into an
+    ArrayPattern of parallel event columns instead; engine is then ignored.
+    If lazy is True, return a LazyPattern backed by a memory map of the file,
+    which parses each track the first time it is accessed.
+    include and exclude optionally name the event classes to keep or drop
+    (see CursorFileReader); dropped events are never constructed.
+    '''
+    filters = include is not None or exclude is not None
+    if filters:
+        assert engine == 'cursor' and not columnar, \
+            "Event filtering needs the cursor engine"
+    if lazy:
+        assert not columnar, "Lazy reading only supports Patterns"
+        with open(filename, 'rb') as f:
+            try:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                buffer = BytesIO(f.read())
+        return LazyFileReader(include, exclude).read(buffer)
     with open(filename, 'rb') as f:
-        reader = FileReader()
+        if columnar:
+            reader = ArrayFileReader()
+        elif filters:
+            reader = CursorFileReader(include, exclude)
+        else:
+            reader = READERS[engine]()
         return reader.read(f)
+
+
+def iter_midifile(filename, absolute=False, include=None, exclude=None):
+    '''
+    Yield (track index, event) tuples from a MIDI file as they are decoded,
+    without building Tracks or a Pattern. Only one track's bytes are held in
+    memory at a time. If absolute is True, event ticks are absolute.
+    include and exclude filter events as in read_midifile.
+    '''
+    with open(filename, 'rb') as f:
+        yield from CursorFileReader(include, exclude).iter_events(f, absolute)
+
+
+def scan_midifile(filename):
+    '''
+    Summarize a MIDI file without building its events. Returns a MidiSummary
+    '''
+    with open(filename, 'rb') as f:
+        return ScanFileReader().read(f)
@@ -1,6 +1,17 @@
+from bisect import bisect_right
+from collections import namedtuple
+
+# Tempo change held by a TempoMap: the tick it starts at, its tempo in
+# microseconds per quarter note, milliseconds per tick, and milliseconds
+# elapsed before it
+TempoChange = namedtuple('TempoChange', ['tick', 'mpqn', 'mpt', 'msdelay'])
+
+
 class TempoMap(list):
     def __init__(self, stream):
         self.stream = stream
+        # tick of each tempo change, kept sorted for bisection
+        self.ticks = []
 
     def add_and_update(self, event):
         self.add(event)
@@ -12,26 +23,25 @@ class TempoMap(list):
         # convert into milliseconds per beat
         tempo = tempo / 1000.0
         # generate ms per tick
-        event.mpt = tempo / self.stream.resolution
-        self.append(event)
+        mpt = tempo / self.stream.resolution
+        # insert in tick order, after changes at the same tick
+        i = bisect_right(self.ticks, event.tick)
+        self.ticks.insert(i, event.tick)
+        self.insert(i, TempoChange(event.tick, event.mpqn, mpt, 0))
 
     def update(self):
-        self.sort()
         # adjust running time
         last = None
-        for event in self:
+        for i, tempo in enumerate(self):
             if last:
-                event.msdelay = last.msdelay + \
-                    int(last.mpt * (event.tick - last.tick))
-            last = event
+                tempo = self[i] = tempo._replace(
+                    msdelay=last.msdelay +
+                    int(last.mpt * (tempo.tick - last.tick)))
+            last = tempo
 
     def get_tempo(self, offset=0):
-        last = self[0]
-        for tm in self[1:]:
-            if tm.tick > offset:
-                return last
-            last = tm
-        return last
+        i = bisect_right(self.ticks, offset) - 1
+        return self[max(i, 0)]
 
 class EventStreamIterator(object):
     def __init__(self, stream, window):
@@ -0,0 +1,207 @@
+'''
+Conversion between ticks and seconds through the tempo changes of a pattern,
+and between ticks and bars through its time signature changes
+
+A TempoMap splits time into segments of constant tempo. Each segment keeps
+its first tick, the time in seconds at which it starts (a prefix sum over the
+segments before it) and its length of a tick in seconds, so converting one
+value is a bisection and a multiply-add. Whole sequences of ticks or times
+are converted in one pass that only bisects where the input jumps backwards
+or skips segments. A BarGrid does the same with the bars of each time
+signature.
+'''
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from fractions import Fraction
+from .Events import SetTempoEvent, TimeSignatureEvent
+
+# tempo in microseconds per quarter note until the first SetTempoEvent, as
+# defined by the MIDI standard (120 bpm)
+DEFAULT_MPQN = 500000
+
+
+class TempoMap(object):
+    '''
+    Index of the tempo changes of a pattern at a given resolution (ticks per
+    quarter note). Build one with TempoMap.from_pattern, or read the one
+    cached by Pattern.tempo_map
+    '''
+
+    def __init__(self, tempos=(), resolution=220):
+        '''
+        Params:
+            Optional:
+            tempos: iterable - (absolute tick, microseconds per quarter note)
+                pairs. Of changes at the same tick, the last one holds
+            resolution: int - ticks per quarter note
+        '''
+        self.resolution = resolution
+        ticks = [0]
+        mpqns = [DEFAULT_MPQN]
+        for tick, mpqn in sorted(tempos, key=lambda tempo: tempo[0]):
+            if tick <= ticks[-1]:
+                mpqns[-1] = mpqn
+            elif mpqn != mpqns[-1]:
+                ticks.append(tick)
+                mpqns.append(mpqn)
+        # first tick, start in seconds and seconds per tick of each segment
+        self.ticks = array('d', ticks)
+        self.spt = array('d', (mpqn / 1e6 / resolution for mpqn in mpqns))
+        self.starts = array('d', [0.0])
+        for i in range(1, len(ticks)):
+            self.starts.append(self.starts[i - 1] +
+                               (ticks[i] - ticks[i - 1]) * self.spt[i - 1])
+
+    @classmethod
+    def from_pattern(cls, pattern):
+        '''Index the SetTempoEvents of every track of a pattern'''
+        tempos = []
+        for track in pattern:
+            for tick, event in zip(track.abs_ticks, list.__iter__(track)):
+                if isinstance(event, SetTempoEvent):
+                    tempos.append((tick, event.mpqn))
+        return cls(tempos, pattern.resolution)
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def __repr__(self):
+        return "mydy.TempoMap(resolution=%r, segments=%d)" % (
+            self.resolution, len(self))
+
+    def _segment(self, bounds, value):
+        return max(bisect_right(bounds, value) - 1, 0)
+
+    def seconds(self, tick):
+        '''Time in seconds of an absolute tick'''
+        i = self._segment(self.ticks, tick)
+        return self.starts[i] + (tick - self.ticks[i]) * self.spt[i]
+
+    def tick(self, seconds):
+        '''Absolute tick, as a float, at a time in seconds'''
+        i = self._segment(self.starts, seconds)
+        return self.ticks[i] + (seconds - self.starts[i]) / self.spt[i]
+
+    def mpqn(self, tick):
+        '''Tempo in microseconds per quarter note at an absolute tick'''
+        i = self._segment(self.ticks, tick)
+        return round(self.spt[i] * 1e6 * self.resolution)
+
+    def _convert(self, values, bounds, offsets, rates, divide):
+        out = array('d')
+        append = out.append
+        last = len(bounds) - 1
+        i = 0
+        for value in values:
+            if value < bounds[i] or (i < last - 1 and value >= bounds[i + 2]):
+                # jumped backwards or past the next segment
+                i = self._segment(bounds, value)
+            elif i < last and value >= bounds[i + 1]:
+                i += 1
+            if divide:
+                append(offsets[i] + (value - bounds[i]) / rates[i])
+            else:
+                append(offsets[i] + (value - bounds[i]) * rates[i])
+        return out
+
+    def to_seconds(self, ticks):
+        '''
+        Convert an iterable of absolute ticks to an array of times in seconds.
+        Sorted input, such as Track.abs_ticks, takes a single linear pass
+        '''
+        return self._convert(ticks, self.ticks, self.starts, self.spt, False)
+
+    def to_ticks(self, seconds):
+        '''Convert an iterable of times in seconds to an array of ticks'''
+        return self._convert(seconds, self.starts, self.ticks, self.spt, True)
+
+
+# Span of constant time signature in a BarGrid: its first tick and bar, the
+# length of its beats and bars in ticks, and the data bytes of the
+# TimeSignatureEvent that started it
+Meter = namedtuple('Meter', ['tick', 'bar', 'beat_ticks', 'bar_ticks', 'data'])
+
+# data bytes of the 4/4 time signature assumed before the first change
+DEFAULT_TIME_SIGNATURE = bytes([4, 2, 24, 8])
+
+
+def _exact(num, den):
+    '''num / den as an int if it is whole, else as a Fraction'''
+    return num // den if not num % den else Fraction(num, den)
+
+
+class BarGrid(object):
+    '''
+    Index of the bars of a pattern, from its time signature changes. Bars and
+    beats count from 0. A change that doesn't fall on a bar line starts a new
+    bar, cutting the previous one short. Build one with BarGrid.from_pattern,
+    or read the one cached by Pattern.bar_grid
+    '''
+
+    def __init__(self, signatures=(), resolution=220):
+        '''
+        Params:
+            Optional:
+            signatures: iterable - (absolute tick, data bytes of a
+                TimeSignatureEvent) pairs. Of changes at the same tick, the
+                last one holds
+            resolution: int - ticks per quarter note
+        '''
+        self.resolution = resolution
+        meters = [self._meter(0, 0, DEFAULT_TIME_SIGNATURE)]
+        for tick, data in sorted(signatures, key=lambda change: change[0]):
+            last = meters[-1]
+            if tick <= last.tick:
+                meters[-1] = self._meter(last.tick, last.bar, data)
+            elif bytes(data[:2]) != bytes(last.data[:2]):
+                bars = -(-(tick - last.tick) // last.bar_ticks)
+                meters.append(self._meter(tick, last.bar + bars, data))
+        self.meters = meters
+        self.ticks = [meter.tick for meter in meters]
+        self.bars = [meter.bar for meter in meters]
+
+    def _meter(self, tick, bar, data):
+        numerator, power = data[0], data[1]
+        # a beat is a 1/2**power note, a quarter note being resolution ticks
+        beat_ticks = _exact(self.resolution * 4, 2 ** power)
+        return Meter(tick, bar, beat_ticks, beat_ticks * numerator,
+                     bytes(data))
+
+    @classmethod
+    def from_pattern(cls, pattern):
+        '''Index the TimeSignatureEvents of every track of a pattern'''
+        signatures = []
+        for track in pattern:
+            for tick, event in zip(track.abs_ticks, list.__iter__(track)):
+                if isinstance(event, TimeSignatureEvent):
+                    signatures.append((tick, event.data))
+        return cls(signatures, pattern.resolution)
+
+    def __len__(self):
+        return len(self.meters)
+
+    def __repr__(self):
+        return "mydy.BarGrid(resolution=%r, meters=%d)" % (
+            self.resolution, len(self))
+
+    def meter_at(self, tick):
+        '''Meter in effect at an absolute tick'''
+        return self.meters[max(bisect_right(self.ticks, tick) - 1, 0)]
+
+    def bar_to_tick(self, bar, beat=0):
+        '''Absolute tick at which a beat of a bar starts'''
+        meter = self.meters[max(bisect_right(self.bars, bar) - 1, 0)]
+        return (meter.tick + (bar - meter.bar) * meter.bar_ticks +
+                beat * meter.beat_ticks)
+
+    def tick_to_bar(self, tick):
+        '''
+        Bar and beat at an absolute tick. The beat is exact: an int, or a
+        Fraction between beats
+        '''
+        meter = self.meter_at(tick)
+        bar, offset = divmod(tick - meter.tick, meter.bar_ticks)
+        beat = Fraction(offset) / meter.beat_ticks
+        return (meter.bar + int(bar),
+                int(beat) if beat.denominator == 1 else beat)
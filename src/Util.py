@@ -1,34 +1,85 @@
 '''
 Utils for reading and writing variable-length-quantities
 '''
-from collections import deque
+from array import array
+
+
+def _encode_varlen(value):
+    '''Translates a value to bytes in the variable length format'''
+    assert value >= 0, "Variable length quantities can't be negative"
+    chrs = bytearray([_7_bit_mask(value)])
+    value >>= 7
+    while value:
+        chrs.append(_flag_next_byte(_7_bit_mask(value)))
+        value >>= 7
+    chrs.reverse()
+    return bytes(chrs)
 
 def read_varlen(byte_iter):
     '''Reads a variable length quantity from an iterator'''
     byte = next(byte_iter)
-    if not _has_next_byte(byte):
+    if not byte & 0x80:
         return byte
-    value = _remove_flag(byte)
-    while _has_next_byte(byte):
+    value = byte & 0x7f
+    while byte & 0x80:
         byte = next(byte_iter)
-        value <<= 7
-        value += (byte & 0x7f)
+        value = (value << 7) | (byte & 0x7f)
     return value
 
+def read_varlen_at(buf, offset):
+    '''
+    Reads a variable length quantity from an indexable buffer, starting at
+    offset. Returns the value and the offset of the byte following it.
+    '''
+    byte = buf[offset]
+    offset += 1
+    value = byte & 0x7f
+    while byte & 0x80:
+        byte = buf[offset]
+        offset += 1
+        value = (value << 7) | (byte & 0x7f)
+    return value, offset
+
+def read_varlens(buf, count=None, offset=0):
+    '''
+    Reads consecutive variable length quantities from a buffer, starting at
+    offset, until count values are read or the buffer ends. Returns an
+    unsigned array of the values and the offset of the byte following them.
+    '''
+    values = array('Q')
+    append = values.append
+    value = 0
+    more = False
+    if count == 0:
+        return values, offset
+    with memoryview(buf) as view:
+        for offset, byte in enumerate(view[offset:], offset + 1):
+            value = (value << 7) | (byte & 0x7f)
+            more = byte & 0x80
+            if not more:
+                append(value)
+                value = 0
+                if len(values) == count:
+                    break
+    if more:
+        raise IndexError('Variable length quantity runs past end of buffer')
+    return values, offset
+
 def write_varlen(value):
     '''Translates a value to bytes in the variable length format'''
-    # deques let us appendleft at no cost
-    chrs = deque()
-    chrs.appendleft(bytearray([_7_bit_mask(value)]))
-    value >>= 7
-    while value:
-        chrs.appendleft(bytearray([_flag_next_byte(_7_bit_mask(value))]))
-        value >>= 7
-    return b''.join(chrs)
+    if 0 <= value < _VARLEN_TABLE_SIZE:
+        return _VARLEN_TABLE[value]
+    return _encode_varlen(value)
 
-def _has_next_byte(byte):
-    '''Determine if stream has a next byte by checking the most significant bit'''
-    return byte & 0x80
+def write_varlens(values):
+    '''
+    Translates an iterable of values (list, array...) to the concatenation of
+    their variable length encodings
+    '''
+    table = _VARLEN_TABLE
+    size = _VARLEN_TABLE_SIZE
+    return b''.join([table[value] if 0 <= value < size
+                     else _encode_varlen(value) for value in values])
 
 def _flag_next_byte(byte):
     '''Flag the most significant bit to indicate more bytes incoming'''
@@ -37,6 +88,14 @@ def _flag_next_byte(byte):
 def _remove_flag(byte):
     '''Extract value from byte by masking last 7 bits'''
     return byte & 0x7f
-              
+
 # alias
 _7_bit_mask = _remove_flag
+
+# encodings of every value that fits in one or two bytes, which covers
+# nearly all delta ticks
+_VARLEN_TABLE_SIZE = 1 << 14
+_VARLEN_TABLE = tuple(
+    [bytes([value]) for value in range(0x80)] +
+    [bytes([_flag_next_byte(value >> 7), _7_bit_mask(value)])
+     for value in range(0x80, _VARLEN_TABLE_SIZE)])
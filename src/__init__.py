@@ -1,5 +1,8 @@
+from . import Arrays
 from . import Containers
 from . import Constants
+from . import Corpus
 from . import Events
 from . import FileIO
+from . import Tempo
 from . import Util
@@ -202,13 +202,8 @@ class Sequencer(object):
     def output_pending(self):
         return S.snd_seq_event_output_pending(self.client)
 
-    ## EVENT HANDLERS
-    ##
     def event_write(self, event, direct=False, relative=False, tick=False):
         #print(event.__class__, event)
-        ## Event Filter
-        if isinstance(event, midi.EndOfTrackEvent):
-            return
         seqev = S.snd_seq_event_t()
         ## common
         seqev.dest.client = self.write_dest.client
@@ -235,44 +230,15 @@ class Sequencer(object):
                 seqev.time.time.tv_sec = sec
                 seqev.time.time.tv_nsec = nsec
 
-        ## Tempo Change
-        if isinstance(event, midi.SetTempoEvent):
-            adjtempo = int(60.0 * 1000000.0 / event.bpm)
-            seqev.type = S.SND_SEQ_EVENT_TEMPO
-            seqev.dest.client = S.SND_SEQ_CLIENT_SYSTEM
-            seqev.dest.port = S.SND_SEQ_PORT_SYSTEM_TIMER
-            seqev.data.queue.queue = self.queue
-            seqev.data.queue.param.value = adjtempo
-        ## Note Event
-        elif isinstance(event, midi.NoteEvent):
-            if isinstance(event, midi.NoteOnEvent):
-                seqev.type = S.SND_SEQ_EVENT_NOTEON
-            if isinstance(event, midi.NoteOffEvent):
-                seqev.type = S.SND_SEQ_EVENT_NOTEOFF
-            seqev.data.note.channel = event.channel
-            seqev.data.note.note = event.pitch
-            seqev.data.note.velocity = event.velocity
-        ## Control Change
-        elif isinstance(event, midi.ControlChangeEvent):
-            seqev.type = S.SND_SEQ_EVENT_CONTROLLER
-            seqev.data.control.channel = event.channel
-            seqev.data.control.param = event.control
-            seqev.data.control.value = event.value
-        ## Program Change
-        elif isinstance(event, midi.ProgramChangeEvent):
-            seqev.type = S.SND_SEQ_EVENT_PGMCHANGE
-            seqev.data.control.channel = event.channel
-            seqev.data.control.value = event.value
-        ## Pitch Bench
-        elif isinstance(event, midi.PitchWheelEvent):
-            seqev.type = S.SND_SEQ_EVENT_PITCHBEND
-            seqev.data.control.channel = event.channel
-            seqev.data.control.value = event.pitch
+        ## Event Filter, by the event class's hook
+        sent = event.alsa_write(seqev, S, self.queue)
+        if sent is None:
+            return
         ## Unknown
-        else:
+        if sent is False:
             print("Warning :: Unknown event type: %s" % event)
             return None
-            
+
         err = S.snd_seq_event_output(self.client, seqev)
         if (err < 0): self._error(err)
         self.drain()
@@ -2,8 +2,14 @@
 Tests for MIDI modules
 '''
 import unittest
+import gc
+import os
+import pickle
 import random
 import math
+import multiprocessing
+from io import BytesIO
+from fractions import Fraction
 from itertools import chain
 # in the dev environment, mydy is known as src
 import src as mydy
@@ -14,6 +20,8 @@ Util = mydy.Util
 FileIO = mydy.FileIO
 Events = mydy.Events
 Containers = mydy.Containers
+Arrays = mydy.Arrays
+Corpus = mydy.Corpus
 MAX_TICK_RESOLUTION = mydy.Constants.MAX_TICK_RESOLUTION
 
 
@@ -24,6 +32,30 @@ class TestUtil(unittest.TestCase):
             self.assertEqual(test, Util.read_varlen(
                 iter(Util.write_varlen(test))))
 
+    def test_varlen_table(self):
+        '''Table-driven encodings match the general encoder at the edges'''
+        for value in [0, 127, 128, 2 ** 14 - 1, 2 ** 14, 2 ** 21]:
+            encoded = Util.write_varlen(value)
+            self.assertEqual(encoded, Util._encode_varlen(value))
+            self.assertEqual(Util.read_varlen_at(encoded, 0),
+                             (value, len(encoded)))
+
+    def test_bulk_varlens(self):
+        '''Bulk encoding and decoding are inverses of each other'''
+        values = [random.randint(0, 2 ** random.choice([7, 14, 28, 64]) - 1)
+                  for _ in range(1000)]
+        encoded = Util.write_varlens(values)
+        self.assertEqual(encoded, b''.join(map(Util.write_varlen, values)))
+        decoded, offset = Util.read_varlens(encoded)
+        self.assertEqual((list(decoded), offset), (values, len(encoded)))
+        first = len(Util.write_varlen(values[0]))
+        decoded, offset = Util.read_varlens(encoded, 2, first)
+        self.assertEqual((list(decoded), offset),
+                         (values[1:3],
+                          first + len(Util.write_varlens(values[1:3]))))
+        with self.assertRaises(IndexError):
+            Util.read_varlens(encoded[:-1] + b'\x80')
+
 
 class TestFileIO(unittest.TestCase):
 
@@ -36,9 +68,383 @@ class TestFileIO(unittest.TestCase):
         read2 = read * (2 / 3)
         FileIO.write_midifile('test.mid', read2)
 
+    def test_write_track(self):
+        '''Tracks are encoded with running status and a patched length'''
+        track = Containers.Track([
+            Events.NoteOnEvent(tick=0, pitch=60, velocity=200),
+            Events.NoteOnEvent(tick=200, pitch=60, velocity=0),
+            Events.EndOfTrackEvent(tick=0)])
+        buf = BytesIO()
+        FileIO.FileWriter().write_track(buf, track)
+        self.assertEqual(buf.getvalue(), b'MTrk\x00\x00\x00\x0c' + bytes(
+            [0, 0x90, 60, 127, 0x81, 0x48, 60, 0, 0, 0xFF, 0x2F, 0]))
+
+    def test_stream_writer(self):
+        '''Streamed files match FileWriter, seekable output or not'''
+        pattern = FileIO.read_midifile('sotw.mid')
+        for track in pattern:
+            # re-encode the tracks rather than copying their raw chunks
+            track._touch()
+        expected = BytesIO()
+        FileIO.FileWriter().write(expected, pattern)
+
+        class Pipe(BytesIO):
+            def seekable(self):
+                return False
+
+        for buf in [BytesIO(), Pipe()]:
+            with FileIO.MidiStreamWriter(buf, pattern.resolution,
+                                         pattern.format) as writer:
+                writer.flush_size = 16
+                for track in pattern:
+                    writer.new_track()
+                    writer.extend(track)
+            self.assertEqual(buf.getvalue(), expected.getvalue())
+
+    def test_raw_passthrough(self):
+        '''Untouched tracks are written back byte for byte'''
+        with open('mary.mid', 'rb') as f:
+            original = f.read()
+        for lazy in [False, True]:
+            pattern = FileIO.read_midifile('mary.mid', lazy=lazy)
+            self.assertTrue(pattern[1].length > 0)
+            buf = BytesIO()
+            FileIO.FileWriter().write(buf, pattern)
+            self.assertEqual(buf.getvalue(), original)
+        self.assertIsNotNone(pattern.copy()[0]._raw)
+        # handing out events drops the chunk, as they may change afterwards
+        note = pattern[1][5]
+        self.assertIsNone(pattern[1]._raw)
+        note.velocity += 1
+        self.assertEqual(pattern[1][5].velocity, note.velocity)
+        # as does changing the track
+        pattern = FileIO.read_midifile('mary.mid')
+        self.assertIsNotNone(pattern[0]._raw)
+        pattern[0].append(Events.EndOfTrackEvent(tick=5))
+        self.assertIsNone(pattern[0]._raw)
+        for event in pattern[1]:
+            event.tick += 1
+        self.assertIsNone(pattern[1]._raw)
+        buf = BytesIO()
+        FileIO.FileWriter().write(buf, pattern)
+        self.assertEqual(FileIO.FileReader().read(BytesIO(buf.getvalue())),
+                         pattern)
+
+    def test_cursor_engine(self):
+        '''Test that the cursor and iterator engines parse identically'''
+        for filename in ['mary.mid', 'sotw.mid']:
+            self.assertEqual(FileIO.read_midifile(filename, engine='iter'),
+                             FileIO.read_midifile(filename, engine='cursor'))
+
+    def test_cursor_truncated_track(self):
+        '''A truncated final event is dropped, as with the iterator engine'''
+        data = bytes([0, 0x90, 60, 100, 10, 62, 100, 5, 0x80, 60])
+        events = FileIO.CursorFileReader().parse_track_data(data)
+        self.assertEqual(events, (
+            Events.NoteOnEvent(tick=0, pitch=60, velocity=100),
+            Events.NoteOnEvent(tick=10, pitch=62, velocity=100)))
+
+    def test_columnar_read(self):
+        '''Columnar decoding converts back to the same Pattern'''
+        for filename in ['mary.mid', 'sotw.mid']:
+            arrays = FileIO.read_midifile(filename, columnar=True)
+            pattern = FileIO.read_midifile(filename)
+            self.assertEqual(arrays.to_pattern(), pattern)
+            self.assertEqual(arrays.to_pattern(relative=False),
+                             Containers.Pattern(
+                                 (t.make_ticks_abs() for t in pattern),
+                                 pattern.resolution, pattern.format, False))
+        track = FileIO.read_midifile('mary.mid', columnar=True)[1]
+        note = FileIO.read_midifile('mary.mid')[1][5]
+        self.assertEqual((track.status[5], track.data1[5], track.data2[5]),
+                         (note.status, note.pitch, note.velocity))
+
+    def test_lazy_read(self):
+        '''Lazy patterns parse tracks on first access'''
+        pattern = FileIO.read_midifile('mary.mid', lazy=True)
+        self.assertEqual(pattern.loaded, [False, False])
+        self.assertEqual(pattern[-1], FileIO.read_midifile('mary.mid')[1])
+        self.assertEqual(pattern.loaded, [False, True])
+        self.assertEqual(pattern, FileIO.read_midifile('mary.mid'))
+        self.assertEqual(pattern.loaded, [True, True])
+
+    def test_scan(self):
+        '''scan_midifile summarizes the events a full read produces'''
+        # a track mixing running and explicit statuses, long delta ticks and
+        # repeated meta events
+        track = Containers.Track()
+        for i in range(200):
+            tick = [0, 5, 200, 20000, 3000000][i % 5]
+            channel = i % 3 // 2
+            track.append(Events.NoteOnEvent(tick=tick, channel=channel,
+                                            data=[60 + i % 7, 100]))
+            if i % 4 == 0:
+                track.append(Events.NoteOffEvent(tick=tick, data=[60, 0]))
+            if i % 9 == 0:
+                track.append(Events.ProgramChangeEvent(data=[i % 128]))
+                track.append(Events.TrackNameEvent(tick=tick, text='part'))
+                track.append(Events.SetTempoEvent(bpm=[120, 90][i % 2]))
+            if i % 31 == 0:
+                track.append(Events.SysexEvent(data=[1, 2, 3, 0xF7]))
+                track.append(Events.TextMetaEvent(text='comment'))
+        track.append(Events.EndOfTrackEvent(tick=1))
+        synthesized = 'scan.mid'
+        FileIO.write_midifile(synthesized,
+                              Containers.Pattern(tracks=[track]))
+        self.addCleanup(os.remove, synthesized)
+        for filename in ['mary.mid', 'sotw.mid', synthesized]:
+            summary = FileIO.scan_midifile(filename)
+            pattern = FileIO.read_midifile(filename)
+            self.assertEqual((summary.format, summary.resolution,
+                              summary.num_tracks),
+                             (pattern.format, pattern.resolution,
+                              len(pattern)))
+            self.assertEqual(summary.total_ticks,
+                             max(track.length for track in pattern))
+            counts = {}
+            for track in pattern:
+                for event in track:
+                    name = event.__class__.__name__
+                    counts[name] = counts.get(name, 0) + 1
+            self.assertEqual(summary.event_counts, counts)
+        summary = FileIO.scan_midifile('mary.mid')
+        self.assertEqual(summary.time_signatures, [(0, 4, 4)])
+        self.assertEqual(summary.track_names, [None, None])
+        summary = FileIO.scan_midifile(synthesized)
+        self.assertEqual(summary.track_names, ['part'])
+        self.assertEqual([mpqn for _, mpqn in summary.tempos],
+                         [500000, 666666] * 11 + [500000])
+
+    def test_iter_midifile(self):
+        '''Streamed events match the tracks of a full read'''
+        pattern = FileIO.read_midifile('mary.mid')
+        streamed = list(FileIO.iter_midifile('mary.mid'))
+        self.assertEqual([index for index, _ in streamed],
+                         [i for i, track in enumerate(pattern)
+                          for _ in track])
+        self.assertEqual([event for _, event in streamed],
+                         [event for track in pattern for event in track])
+        absolute = [event for index, event in
+                    FileIO.iter_midifile('mary.mid', absolute=True)
+                    if index == 1]
+        self.assertEqual(absolute, list(pattern[1].make_ticks_abs()))
+
+    def test_filtered_read(self):
+        '''Dropped events fold their ticks into the next kept event'''
+        pattern = FileIO.read_midifile('sotw.mid')
+        kept = (Events.NoteOnEvent, Events.NoteOffEvent)
+        filtered = FileIO.read_midifile('sotw.mid', include=kept)
+        excluded = FileIO.read_midifile('sotw.mid', exclude=Events.MetaEvent)
+        signatures = FileIO.read_midifile(
+            'sotw.mid', include=Events.TimeSignatureEvent)
+        for track, only, without, meters in zip(pattern, filtered, excluded,
+                                                signatures):
+            expect = [event for event in track.make_ticks_abs()
+                      if isinstance(event, kept)]
+            self.assertEqual(list(only.make_ticks_abs()), expect)
+            self.assertFalse(any(isinstance(event, Events.MetaEvent)
+                                 for event in without))
+            expect = [event for event in track.make_ticks_abs()
+                      if isinstance(event, Events.TimeSignatureEvent)]
+            self.assertEqual(list(meters.make_ticks_abs()), expect)
+
+    def test_pickle(self):
+        '''Patterns, including lazy ones, survive a pickle round trip'''
+        pattern = FileIO.read_midifile('sotw.mid')
+        self.assertEqual(pickle.loads(pickle.dumps(pattern)), pattern)
+        lazy = FileIO.read_midifile('sotw.mid', lazy=True)
+        self.assertEqual(pickle.loads(pickle.dumps(lazy)), pattern)
+
+
+class TestCorpus(unittest.TestCase):
+
+    def test_read_corpus(self):
+        '''Corpus reads report failures as records, in order if asked'''
+        paths = ['mary.mid', 'missing.mid', 'sotw.mid', 'tests/test.py']
+        results = list(Corpus.read_corpus(paths, workers=2, ordered=True,
+                                          max_in_flight=2))
+        self.assertEqual([result.path for result in results], paths)
+        self.assertEqual(results[0].pattern, FileIO.read_midifile('mary.mid'))
+        self.assertEqual(results[1].error.type, 'FileNotFoundError')
+        self.assertEqual(results[3].error.message, 'Bad header in MIDI file')
+        unordered = Corpus.read_corpus(paths, workers=0)
+        self.assertEqual([result.error is None for result in unordered],
+                         [True, False, True, False])
+
+    def test_worker_crash(self):
+        '''A crashed worker fails only the file that crashed it'''
+        # the workers must inherit the reader registered here
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            self.skipTest('needs fork to start workers')
+
+        class CrashingReader(FileIO.CursorFileReader):
+            def read(self, buffer):
+                if buffer.name == 'sotw.mid':
+                    os._exit(1)
+                return super().read(buffer)
+        FileIO.READERS['crash'] = CrashingReader
+        self.addCleanup(FileIO.READERS.pop, 'crash')
+        paths = ['mary.mid', 'sotw.mid', 'mary.mid', 'sotw.mid', 'mary.mid']
+        fork = multiprocessing.get_context('fork')
+        for workers, max_in_flight in [(1, 1), (2, 4), (2, 8)]:
+            results = list(Corpus.read_corpus(
+                paths, workers=workers, ordered=True,
+                max_in_flight=max_in_flight, engine='crash',
+                mp_context=fork))
+            self.assertEqual([result.path for result in results], paths)
+            self.assertEqual([result.error and result.error.type
+                              for result in results],
+                             [None, 'BrokenProcessPool', None,
+                              'BrokenProcessPool', None])
+            for result in results[::2]:
+                self.assertEqual(result.pattern,
+                                 FileIO.read_midifile('mary.mid'))
+
 
 class TestEvents(unittest.TestCase):
 
+    def test_freeze(self):
+        '''Frozen events are immutable, hashable and interned'''
+        event = Events.NoteOnEvent(tick=5, pitch=60, velocity=100, channel=3)
+        frozen = event.freeze()
+        self.assertIsInstance(frozen, Events.FrozenNoteOnEvent)
+        self.assertIs(frozen, Events.NoteOnEvent(
+            tick=5, pitch=60, velocity=100, channel=3).freeze())
+        self.assertEqual(frozen, event)
+        self.assertEqual(len({frozen, event.copy().freeze(),
+                              (event >> 1).freeze()}), 2)
+        with self.assertRaises(AttributeError):
+            frozen.pitch = 61
+        self.assertIs(frozen.copy(), frozen)
+        self.assertIs(frozen + 1, (event + 1).freeze())
+        thawed = frozen.thaw()
+        thawed.pitch = 61
+        self.assertEqual(thawed.pitch, 61)
+        self.assertIs(pickle.loads(pickle.dumps(frozen)), frozen)
+        text = Events.TrackNameEvent(text='piano').freeze()
+        self.assertEqual(text.text, 'piano')
+
+    def test_dispatch(self):
+        '''Registered classes slot into the status byte dispatch table'''
+        registry = Events.EventRegistry
+        self.assertIs(registry.Dispatch[0x93], Events.NoteOnEvent)
+        self.assertIs(registry.Dispatch[0xFF], Events.MetaEvent)
+        self.assertIsNone(registry.Dispatch[0x40])
+
+        class SongPositionEvent(Events.Event):
+            status = 0xF2
+            length = 2
+        try:
+            self.assertIs(registry.Dispatch[0xF2], SongPositionEvent)
+            data = bytes([0, 0xF2, 1, 2, 0, 0xFF, 0x2F, 0])
+            events = FileIO.CursorFileReader().parse_track_data(data)
+            self.assertEqual(events[0], SongPositionEvent(data=[1, 2]))
+            reader = FileIO.ArrayFileReader()
+            reader.pattern = Arrays.ArrayPattern()
+            self.assertEqual(reader.parse_track_data(data).to_track(),
+                             Containers.Track(events))
+            buf = BytesIO()
+            FileIO.FileWriter().write_track(buf, Containers.Track(events))
+            self.assertEqual(buf.getvalue()[8:], data)
+            buf = BytesIO()
+            FileIO.FileWriter().write(
+                buf, Containers.Pattern(tracks=[Containers.Track(events)]))
+            summary = FileIO.ScanFileReader().read(BytesIO(buf.getvalue()))
+            self.assertEqual(summary.event_counts,
+                             {'SongPositionEvent': 1, 'EndOfTrackEvent': 1})
+            # running status carries over channel events only
+            track = Containers.Track([
+                SongPositionEvent(data=[1, 2]), SongPositionEvent(data=[3, 4]),
+                Events.NoteOnEvent(data=[60, 1]),
+                Events.TextMetaEvent(text='a'),
+                Events.NoteOnEvent(data=[61, 1]),
+                Events.NoteOnEvent(data=[62, 1]),
+                Events.EndOfTrackEvent()])
+            data = bytes([0, 0xF2, 1, 2, 0, 0xF2, 3, 4, 0, 0x90, 60, 1,
+                          0, 0xFF, 0x01, 1, ord('a'), 0, 0x90, 61, 1, 0, 62, 1,
+                          0, 0xFF, 0x2F, 0])
+            buf = BytesIO()
+            FileIO.FileWriter().write_track(buf, track)
+            self.assertEqual(buf.getvalue()[8:], data)
+            self.assertEqual(FileIO.CursorFileReader().parse_track_data(data),
+                             tuple(track))
+            arrays = Arrays.ArrayTrack.from_track(track)
+            self.assertEqual(FileIO.FileWriter().encode_array_track(arrays),
+                             data)
+        finally:
+            del registry.Events[0xF2]
+            registry.Dispatch[0xF2] = None
+            # registering made a frozen variant in the Events module
+            del Events.FrozenSongPositionEvent
+
+    def test_alsa_write(self):
+        '''The sequencer bridge encodes through each class's alsa_write'''
+        from types import SimpleNamespace as NS
+        alsa = NS(SND_SEQ_EVENT_NOTEON=6, SND_SEQ_EVENT_NOTEOFF=7,
+                  SND_SEQ_EVENT_CONTROLLER=10, SND_SEQ_EVENT_PGMCHANGE=11,
+                  SND_SEQ_EVENT_PITCHBEND=13, SND_SEQ_EVENT_TEMPO=35,
+                  SND_SEQ_EVENT_SONGPOS=20, SND_SEQ_CLIENT_SYSTEM=0,
+                  SND_SEQ_PORT_SYSTEM_TIMER=0)
+
+        def write(event):
+            seqev = NS(type=None, dest=NS(client=None, port=None),
+                       data=NS(note=NS(), control=NS(), queue=NS(param=NS())))
+            return event.alsa_write(seqev, alsa, 3), seqev
+
+        for event in (Events.NoteOnEvent(channel=2, pitch=60, velocity=90),
+                      Events.NoteOnEvent(channel=2, pitch=60,
+                                         velocity=90).freeze()):
+            sent, seqev = write(event)
+            self.assertIs(sent, True)
+            self.assertEqual(seqev.type, alsa.SND_SEQ_EVENT_NOTEON)
+            self.assertEqual(vars(seqev.data.note),
+                             {'channel': 2, 'note': 60, 'velocity': 90})
+        sent, seqev = write(Events.PitchWheelEvent(channel=1, pitch=-200))
+        self.assertEqual((seqev.type, seqev.data.control.value),
+                         (alsa.SND_SEQ_EVENT_PITCHBEND, -200))
+        sent, seqev = write(Events.SetTempoEvent(bpm=120))
+        self.assertEqual(seqev.data.queue.queue, 3)
+        self.assertEqual(seqev.data.queue.param.value, 500000)
+        self.assertIsNone(write(Events.EndOfTrackEvent())[0])
+        self.assertIs(write(Events.TextMetaEvent(text='a'))[0], False)
+
+        registry = Events.EventRegistry
+
+        class SongPositionEvent(Events.Event):
+            status = 0xF2
+            length = 2
+
+            def alsa_write(self, seqev, alsa, queue):
+                seqev.type = alsa.SND_SEQ_EVENT_SONGPOS
+                seqev.data.control.value = self.data[0] | self.data[1] << 7
+                return True
+        try:
+            data = bytes([0, 0xF2, 1, 2, 0, 0xFF, 0x2F, 0])
+            event = FileIO.CursorFileReader().parse_track_data(data)[0]
+            self.assertIsInstance(event, SongPositionEvent)
+            for event in (event, event.freeze()):
+                sent, seqev = write(event)
+                self.assertIs(sent, True)
+                self.assertEqual((seqev.type, seqev.data.control.value),
+                                 (alsa.SND_SEQ_EVENT_SONGPOS, 257))
+        finally:
+            del registry.Events[0xF2]
+            registry.Dispatch[0xF2] = None
+            del Events.FrozenSongPositionEvent
+
+    def test_unknown_status(self):
+        '''Status bytes no class is registered for are parse errors'''
+        # a timing clock after running status, and a bare sysex escape
+        for data in [bytes([0, 0x90, 60, 100, 0, 0xF8, 0, 0xFF, 0x2F, 0]),
+                     bytes([0, 0xF7, 1, 0xF8, 0, 0xFF, 0x2F, 0])]:
+            columnar = FileIO.ArrayFileReader()
+            columnar.pattern = Arrays.ArrayPattern()
+            for reader in [FileIO.FileReader(), FileIO.CursorFileReader(),
+                           FileIO.CursorFileReader(
+                               exclude=Events.NoteOnEvent), columnar]:
+                with self.assertRaises(ValueError):
+                    reader.parse_track_data(data)
+
     def test_constructors(self):
         '''Test all constructors behave as expected'''
         for _, cls in chain(Events.EventRegistry.Events.items(),
@@ -76,9 +482,259 @@ class TestEvents(unittest.TestCase):
         event3 = event2 / 2.2
         self.assertAlmostEqual(event.tick, event3.tick)
 
+    def test_compact_events(self):
+        '''Events have no __dict__ and store in-range data as bytes'''
+        pattern = FileIO.read_midifile('mary.mid')
+        event = pattern[1][5]
+        self.assertFalse(hasattr(event, '__dict__'))
+        self.assertIsInstance(event._data, bytes)
+        # data still reads and writes like a list
+        self.assertEqual(event.data, [event.pitch, event.velocity])
+        data = event.data.copy()
+        event.data[0] += 1
+        self.assertEqual((event.pitch, data[0]), (data[0] + 1, data[0]))
+        event.data[0] -= 1
+        # the view is kept until the data is replaced
+        view = event.data
+        self.assertIs(event.data, view)
+        view.append(3)
+        self.assertIs(event.data, view)
+        view.pop()
+        event.velocity += 1
+        self.assertEqual(event.data, [event.pitch, event.velocity])
+        self.assertEqual(view, [event.pitch, event.velocity])
+        event.data = [1, 2]
+        self.assertEqual((view, event.data), ([data[0], data[1] + 1], [1, 2]))
+        frozen = event.freeze()
+        with self.assertRaises(AttributeError):
+            frozen.data[0] = 5
+        self.assertEqual(frozen.data, [1, 2])
+        event.data = data
+        # out-of-range values survive until truncated on write
+        event2 = event + 200
+        self.assertEqual(event2.pitch, event.pitch + 200)
+        self.assertEqual((event2 - 200).data, event.data)
+        self.assertEqual(event2._truncate().pitch, 127)
+
+    def test_text_event(self):
+        '''Text meta events keep their tick and data'''
+        event = Events.TrackNameEvent(tick=5, text='Piano')
+        self.assertEqual(event.copy(), event)
+        self.assertEqual((event.tick, event.text), (5, 'Piano'))
+        unknown = Events.UnknownMetaEvent(metacommand=0x60, data=[1])
+        self.assertEqual(unknown.copy().metacommand, 0x60)
+        # an explicit metacommand overrides the one of the class
+        lyric = Events.TextMetaEvent(text='la', metacommand=0x05)
+        self.assertEqual(lyric.metacommand, 0x05)
+        self.assertEqual(lyric.copy().metacommand, 0x05)
+        self.assertEqual(lyric.freeze().metacommand, 0x05)
+        self.assertNotEqual(lyric, Events.TextMetaEvent(text='la'))
+        self.assertEqual(Events.TextMetaEvent.metacommand, 0x01)
+
 
 class TestTracks(unittest.TestCase):
 
+    def test_freeze_track(self):
+        '''Frozen tracks share their events with copies and slices'''
+        pattern = FileIO.read_midifile('mary.mid')
+        frozen = pattern.copy().freeze()
+        self.assertEqual(frozen, pattern)
+        track = frozen[1]
+        self.assertIs(track.copy()[5], track[5])
+        self.assertIs(track[2:4][0], track[2])
+        self.assertEqual(track + 1, pattern[1] + 1)
+        self.assertEqual(track.make_ticks_abs(), pattern[1].make_ticks_abs())
+        self.assertEqual(pickle.loads(pickle.dumps(frozen)), pattern)
+
+    def test_freeze_held_events(self):
+        '''Events held across copy and freeze change neither the copy nor
+        what it writes'''
+        pattern = FileIO.read_midifile('mary.mid')
+        track = pattern[1]
+        held = track[5]
+        copy = track.copy()
+        track.freeze()
+        held.pitch = 0
+        self.assertEqual(copy[5].pitch, 64)
+        self.assertEqual(track[5].pitch, 64)
+        buf = BytesIO()
+        FileIO.FileWriter().write(buf, Containers.Pattern(
+            [copy], resolution=pattern.resolution))
+        read = FileIO.FileReader().read(BytesIO(buf.getvalue()))
+        self.assertEqual(read[0][5].pitch, 64)
+
+    def test_freeze_tick_types(self):
+        '''Equal events with ticks of other types are interned apart'''
+        pattern = FileIO.read_midifile('mary.mid')
+        floats = (pattern[1] * 1.0).freeze()
+        ints = (pattern[1] + 0).freeze()
+        fractions = pattern[1].copy()
+        fractions[7].tick = Fraction(fractions[7].tick)
+        fractions.freeze()
+        self.assertEqual(ints, floats)
+        self.assertTrue(all(type(event.tick) is int for event in ints))
+        self.assertIs(type(fractions[7].tick), Fraction)
+        self.assertIsNot(fractions[7], ints[7])
+        buf = BytesIO()
+        FileIO.FileWriter().write(buf, Containers.Pattern(
+            [ints], resolution=pattern.resolution))
+        read = FileIO.FileReader().read(BytesIO(buf.getvalue()))
+        self.assertEqual(read[0], pattern[1])
+
+    def test_copy_on_write(self):
+        '''Copies and slices share events until either side is written to'''
+        pattern = FileIO.read_midifile('mary.mid')
+        track = pattern[1]
+        copy = track.copy()
+        view = track[2:6]
+        self.assertIs(list.__getitem__(copy, 3), list.__getitem__(track, 3))
+        self.assertIs(list.__getitem__(view, 0), list.__getitem__(track, 2))
+        self.assertEqual(view.relative, track.relative)
+        copy[3].tick += 100
+        view[0].tick += 100
+        self.assertEqual(track, FileIO.read_midifile('mary.mid')[1])
+        self.assertEqual(copy[3].tick, track[3].tick + 100)
+        # events that were handed out can be changed later, so copies take
+        # their own events at once
+        event = track[0]
+        list(track)
+        copy = track.copy()
+        self.assertIsNot(list.__getitem__(copy, 0), event)
+        event.tick += 1
+        self.assertEqual(copy[0].tick, event.tick - 1)
+        self.assertIs(track[0], event)
+        copy = track.copy()
+        track.append(Events.EndOfTrackEvent(tick=0))
+        event.tick += 1
+        self.assertIs(track[0], event)
+        self.assertEqual(copy[0].tick, event.tick - 1)
+        # as does dropping the track while its events are held
+        copy = track.copy()
+        del pattern, track
+        event.tick += 1
+        self.assertEqual(copy[0].tick, event.tick - 1)
+
+    def test_copy_on_write_held_events(self):
+        '''Events held across copies and deletions change only their track'''
+        original = FileIO.read_midifile('mary.mid')[1]
+        track = original.copy()
+        held = track[5]
+        copies = [track.copy(), track.copy().copy(), track[:10]]
+        del track
+        gc.collect()
+        held.velocity = 1
+        held.tick += 7
+        for copy in copies:
+            self.assertEqual(copy[5], original[5])
+            self.assertIsNot(copy[5], held)
+        # a copy handing out events of its own keeps them apart from the
+        # dead track's
+        track = original.copy()
+        held = track[5]
+        copy = track.copy()
+        mine = copy[5]
+        self.assertIsNot(mine, held)
+        del track
+        held.tick += 1
+        mine.velocity = 2
+        self.assertEqual(copy[5].velocity, 2)
+        self.assertEqual(copy[5].tick, original[5].tick)
+        self.assertEqual(held.velocity, original[5].velocity)
+        # as does a copy written to after the track is gone
+        track = FileIO.read_midifile('mary.mid')[1]
+        held = track[5]
+        copy = track.copy()
+        del track
+        copy.append(Events.EndOfTrackEvent(tick=0))
+        held.tick += 1
+        self.assertEqual(copy[5], original[5])
+        # an event held from a dead track and added to another still makes
+        # the copies of the dead one copy theirs
+        track = original.copy()
+        held = track[5]
+        copy = track.copy()
+        other = Containers.Track()
+        other.append(held)
+        del track
+        held.tick += 1
+        self.assertEqual(copy[5], original[5])
+        # a track dropped without handing out events leaves its copies the
+        # shared events
+        track = FileIO.read_midifile('mary.mid')[1]
+        event = list.__getitem__(track, 5)
+        copy = track.copy()
+        del track
+        copy.append(Events.EndOfTrackEvent(tick=0))
+        self.assertIs(list.__getitem__(copy, 5), event)
+
+    def test_tick_index(self):
+        '''Time-range queries agree with a walk over absolute ticks'''
+        track = FileIO.read_midifile('mary.mid')[1]
+        absolute = track.make_ticks_abs()
+        ticks = [event.tick for event in absolute]
+        self.assertEqual(list(track.abs_ticks), ticks)
+        self.assertEqual(absolute.abs_ticks, track.abs_ticks)
+        self.assertEqual(track.length, ticks[-1])
+        start, end = ticks[10], ticks[20] + 1
+        index = track.index_at_tick(start)
+        self.assertEqual(index, ticks.index(start))
+        region = track.slice_ticks(start, end)
+        self.assertEqual([tick + start for tick in region.abs_ticks],
+                         [tick for tick in ticks if start <= tick < end])
+        self.assertEqual(list(absolute.slice_ticks(start, end).abs_ticks),
+                         [tick for tick in ticks if start <= tick < end])
+        self.assertEqual(list(track.slice_ticks(0)), list(track))
+        # the index is rebuilt once the track changes
+        track.append(mydy.Events.EndOfTrackEvent(tick=7))
+        self.assertEqual(track.length, ticks[-1] + 7)
+
+    def test_tick_index_events(self):
+        '''The tick index is kept until events are handed out, then rebuilt'''
+        track = FileIO.read_midifile('mary.mid')[1]
+        index = track.abs_ticks
+        track._raw = None
+        FileIO.FileWriter().write_track(BytesIO(), track)
+        self.assertIs(track.abs_ticks, index)
+        self.assertIs(track.copy().abs_ticks, index)
+        event = track[track.index_at_tick(index[-1])]
+        self.assertIsNot(track.abs_ticks, track.abs_ticks)
+        self.assertEqual(track.abs_ticks, index)
+        event.tick += 1000
+        self.assertEqual(track.length, index[-1] + 1000)
+        # toggling relative rewrites the ticks of events handed out at once
+        track.relative = False
+        self.assertFalse(track._stored)
+        self.assertEqual(event.tick, index[-1] + 1000)
+        track.relative = True
+        self.assertEqual(event.tick, 1000 + index[-1] - index[-2])
+        # and those of other tracks once their events are read
+        track = FileIO.read_midifile('mary.mid')[1]
+        track.relative = False
+        self.assertEqual(track.abs_ticks, index)
+        self.assertTrue(track._stored)
+        self.assertEqual(track[-1].tick, index[-1])
+        self.assertFalse(track._stored)
+
+    def test_tick_index_relative_search(self):
+        '''Slices and searches see the ticks the relative flag asks for'''
+        ticks = FileIO.read_midifile('mary.mid')[1].abs_ticks
+        track = FileIO.read_midifile('mary.mid')[1]
+        track.relative = False
+        self.assertEqual([event.tick for event in track[-5:]],
+                         list(ticks[-5:]))
+        track = FileIO.read_midifile('mary.mid')[1]
+        absolute = track.make_ticks_abs()
+        event = absolute[-1].copy()
+        track.relative = False
+        self.assertIn(event, track)
+        self.assertEqual(track.count(event), 1)
+        self.assertEqual(track.index(event), len(track) - 1)
+        track.relative = True
+        self.assertNotIn(event, track)
+        self.assertEqual(track.count(event), 0)
+        with self.assertRaises(ValueError):
+            track.index(event)
+
     def test_add_track(self):
         '''Test that tracks support integer addition'''
         pattern = FileIO.read_midifile('mary.mid')
@@ -119,6 +775,48 @@ class TestTracks(unittest.TestCase):
         self.assertTrue(track.length * 4.2 == (track ** 4.2).length)
         self.assertTrue(int(track.length * 4.2) == int((track ** 4.2).length))
 
+    def test_loop_track(self):
+        '''Lazy loops expand to the same events as powers, none shared'''
+        track = FileIO.read_midifile('mary.mid')[1]
+        looped = track ** 3.5
+        self.assertEqual(list(track.loop(3.5)), list(looped))
+        self.assertEqual(list(track.loop(2) + 1), list((track ** 2) + 1))
+        self.assertEqual(len(set(map(id, looped))), len(looped))
+        self.assertEqual(track.make_ticks_abs() ** 3.5,
+                         looped.make_ticks_abs())
+        sounding = set()
+        for event in looped:
+            if isinstance(event, Events.NoteOnEvent) and event.velocity:
+                sounding.add(event.pitch)
+            elif isinstance(event, Events.NoteEvent):
+                sounding.discard(event.pitch)
+        self.assertEqual(sounding, set())
+
+    def test_sort_track(self):
+        '''Tracks sort by tick, then meta < note off < note on, stably'''
+        track = Containers.Track([
+            Events.NoteOnEvent(tick=10, pitch=60, velocity=100),
+            Events.NoteOnEvent(tick=20, pitch=62, velocity=100),
+            Events.NoteOnEvent(tick=10, pitch=60, velocity=0, channel=1),
+            Events.SetTempoEvent(tick=10, bpm=90),
+            Events.NoteOffEvent(tick=10, pitch=60),
+            Events.EndOfTrackEvent(tick=20)], relative=False)
+        late, early = track[1], track[2]
+        self.assertFalse(late < early)
+        self.assertTrue(early < late)
+        expected = [Events.SetTempoEvent, Events.NoteOffEvent,
+                    Events.NoteOnEvent, Events.NoteOnEvent,
+                    Events.NoteOnEvent, Events.EndOfTrackEvent]
+        random.shuffle(track)
+        for copy in [track.copy(), track.copy().freeze(),
+                     track.make_ticks_rel()]:
+            copy.sort()
+            self.assertEqual([event._event_class for event in copy], expected)
+            self.assertEqual(copy.abs_ticks, (10, 10, 10, 10, 20, 20))
+            self.assertEqual(sorted(copy.make_ticks_abs()),
+                             list(copy.make_ticks_abs()))
+        self.assertEqual([event.channel for event in copy[1:3]], [0, 1])
+
     def test_add_tracks(self):
         '''Tracks can be added together to create a new object'''
         pattern = FileIO.read_midifile('mary.mid')
@@ -155,6 +853,22 @@ class TestTracks(unittest.TestCase):
         self.assertEqual(abscopy, abscopy2)
         relcopy = abscopy.make_ticks_rel()
         self.assertEqual(track, relcopy)
+        # operators see the ticks of the new setting, whether or not the
+        # events were handed out before it changed
+        for held in [False, True]:
+            toggled = FileIO.read_midifile('mary.mid')[1]
+            if held:
+                first = toggled[1]
+            toggled.relative = False
+            expected = [event.tick for event in toggled.copy()]
+            if held:
+                self.assertEqual(first.tick, expected[1])
+            for op, scale in [(lambda x: x + 2, 1), (lambda x: x >> 2, 1),
+                              (lambda x: x * 2, 2)]:
+                result = op(toggled)
+                self.assertFalse(result.relative)
+                self.assertEqual([event.tick for event in result],
+                                 [tick * scale for tick in expected])
 
     def test_merge(self):
         pattern = FileIO.read_midifile('mary.mid')
@@ -170,6 +884,35 @@ class TestTracks(unittest.TestCase):
         merged = track.merge(shifted)
         self.assertTrue(track.merge(shifted).length == track.length + 100)
 
+    def test_merge_many(self):
+        '''Merging tracks matches a stable sort by absolute tick'''
+        pattern = FileIO.read_midifile('mary.mid')
+        tracks = [pattern[1], pattern[0], pattern[1] >> 1, pattern[1] * 0.5]
+        expected = sorted(
+            ((tick, i, event) for i, track in enumerate(tracks)
+             for tick, event in zip(track.abs_ticks, track)
+             if not isinstance(event, Events.EndOfTrackEvent)),
+            key=lambda item: item[:2])
+        merged = Containers.Track.merge_many(tracks, relative=False)
+        self.assertEqual([(event.tick, event.data) for event in merged],
+                         [(tick, event.data) for tick, _, event in expected] +
+                         [(pattern[1].length, [])])
+        self.assertEqual(Containers.Track.merge_many(tracks).make_ticks_abs(),
+                         merged)
+
+    def test_flatten_split(self):
+        '''Splitting a flattened pattern by channel restores its tracks'''
+        pattern = FileIO.read_midifile('mary.mid')
+        flat = pattern.flatten()
+        self.assertEqual((flat.format, len(flat), len(flat[0])),
+                         (0, 1, sum(map(len, pattern)) - 1))
+        split = flat.split_channels()
+        self.assertEqual((split.format, split.resolution, len(split)),
+                         (1, pattern.resolution, len(pattern)))
+        for track, original in zip(split, pattern):
+            self.assertEqual(track[:-1], original[:-1])
+            self.assertEqual(track.length, flat[0].length)
+
     def test_map_attr(self):
         # Map supports optional attr; attrs that are Event-specific
         pattern = FileIO.read_midifile('mary.mid')
@@ -228,6 +971,136 @@ class TestPattern(unittest.TestCase):
         pattern1 >> 200
         math.ceil
 
+    def test_lazy_pattern_pipeline(self):
+        '''Pipelines give the same result as the eager operators'''
+        pattern = FileIO.read_midifile('mary.mid')
+        notes = lambda event: isinstance(event, mydy.Events.NoteEvent)
+        lazy = ((pattern.lazy() + 2) >> 10).filter(notes) * 3
+        lazy = lazy.map(lambda event: event.velocity // 2, 'velocity')
+        eager = (((pattern + 2) >> 10) * 3)
+        eager = mydy.Containers.Pattern(
+            [track.filter(notes).map(lambda event: event.velocity // 2,
+                                     'velocity') for track in eager],
+            eager.resolution, eager.format)
+        self.assertEqual(lazy.materialize(), eager)
+        self.assertEqual(pattern, FileIO.read_midifile('mary.mid'))
+        self.assertEqual(list(pattern[1].lazy().filter(notes) - 2),
+                         list((pattern[1] - 2).filter(notes)))
+        written, expected = BytesIO(), BytesIO()
+        FileIO.FileWriter().write(written, lazy)
+        FileIO.FileWriter().write(expected, eager)
+        self.assertEqual(written.getvalue(), expected.getvalue())
+
+    def test_inplace_pattern(self):
+        '''In-place operators match their copying counterparts'''
+        pattern = FileIO.read_midifile('mary.mid')
+        notes = lambda event: isinstance(event, mydy.Events.NoteEvent)
+        edited = pattern.copy()
+        tracks = list(edited)
+        edited += 3
+        edited >>= 5
+        edited /= 2
+        edited.filter_inplace(notes)
+        edited.map_inplace(lambda event: event.pitch % 12, 'pitch')
+        expected = ((pattern + 3) >> 5) / 2
+        expected = [track.filter(notes).map(lambda event: event.pitch % 12,
+                                            'pitch') for track in expected]
+        self.assertEqual(list(edited), expected)
+        self.assertTrue(all(a is b for a, b in zip(edited, tracks)))
+        frozen = pattern.copy().freeze()
+        frozen -= 2
+        self.assertEqual(frozen, pattern - 2)
+        self.assertTrue(all(event.frozen for event in frozen[1]))
+        track = pattern[1].copy()
+        track += pattern[1]
+        self.assertEqual(track, pattern[1] + pattern[1])
+        with self.assertRaises(TypeError):
+            track *= 0
+
+    def test_tempo_map(self):
+        '''Tick and second conversions follow every tempo change'''
+        pattern = FileIO.read_midifile('mary.mid')
+        pattern[0].insert(0, Events.SetTempoEvent(tick=0, bpm=60))
+        pattern[0].insert(1, Events.SetTempoEvent(tick=2 * pattern.resolution,
+                                                  bpm=120))
+        # the events inserted are held outside, so the map isn't kept
+        tempo_map = pattern.tempo_map
+        self.assertIsNot(pattern.tempo_map, tempo_map)
+        # until a copy takes its own events
+        pattern = pattern.copy()
+        tempo_map = pattern.tempo_map
+        self.assertIs(pattern.tempo_map, tempo_map)
+        self.assertEqual(list(tempo_map.ticks), [0, 2 * pattern.resolution])
+        self.assertEqual(tempo_map.seconds(pattern.resolution), 1)
+        self.assertEqual(tempo_map.seconds(3 * pattern.resolution), 2.5)
+        self.assertEqual(tempo_map.tick(2.5), 3 * pattern.resolution)
+        ticks = list(pattern[1].abs_ticks)
+        seconds = tempo_map.to_seconds(ticks)
+        self.assertEqual(list(seconds), list(map(tempo_map.seconds, ticks)))
+        self.assertEqual(list(tempo_map.to_seconds(ticks[::-1])),
+                         list(seconds)[::-1])
+        for tick, back in zip(ticks, tempo_map.to_ticks(seconds)):
+            self.assertAlmostEqual(tick, back)
+        self.assertEqual(pattern.duration,
+                         tempo_map.seconds(max(t.length for t in pattern)))
+        # handing out events, or changing a track, rebuilds it
+        tempo = pattern[0][1]
+        tempo.bpm = 240
+        self.assertIsNot(pattern.tempo_map, tempo_map)
+        self.assertEqual(pattern.tempo_map.seconds(3 * pattern.resolution),
+                         2.25)
+        pattern[0].pop(1)
+        self.assertEqual(pattern.tempo_map.seconds(3 * pattern.resolution), 3)
+        # as does moving an earlier event of a relative track
+        pattern[1].insert(1, Events.SetTempoEvent(tick=0, bpm=90))
+        tempo_map = pattern.tempo_map
+        pattern[1][0].tick += 1
+        self.assertIsNot(pattern.tempo_map, tempo_map)
+        self.assertIn(pattern[1].abs_ticks[1], list(pattern.tempo_map.ticks))
+
+    def test_bar_grid(self):
+        '''Bars follow every time signature change, and slices carry state'''
+        pattern = FileIO.read_midifile('mary.mid')
+        res = pattern.resolution
+        # two bars of 4/4, then 3/4 at 9 quarters cutting the third bar
+        # short, then 6/8 two bars later (ticks are relative)
+        pattern[0].insert(2, Events.TimeSignatureEvent(
+            tick=9 * res, data=bytes([3, 2, 24, 8])))
+        pattern[0].insert(3, Events.TimeSignatureEvent(
+            tick=6 * res, data=bytes([6, 3, 24, 8])))
+        pattern[0].insert(0, Events.SetTempoEvent(tick=0, bpm=90))
+        pattern = pattern.copy()
+        grid = pattern.bar_grid
+        self.assertIs(pattern.bar_grid, grid)
+        self.assertEqual(grid.bars, [0, 3, 5])
+        self.assertEqual(pattern.bar_to_tick(2), 8 * res)
+        self.assertEqual(pattern.bar_to_tick(3), 9 * res)
+        self.assertEqual(pattern.bar_to_tick(5, 1), 15 * res + res // 2)
+        self.assertEqual(pattern.tick_to_bar(res), (0, 1))
+        self.assertEqual(pattern.tick_to_bar(8 * res + res // 2),
+                         (2, Fraction(1, 2)))
+        for bar in range(8):
+            self.assertEqual(pattern.tick_to_bar(pattern.bar_to_tick(bar)),
+                             (bar, 0))
+        sliced = pattern.slice_bars(5, 7)
+        self.assertEqual(sliced.resolution, res)
+        self.assertEqual(sliced[1].length, 6 * res)
+        first = sliced[0][:2]
+        self.assertEqual([event.tick for event in first], [0, 0])
+        self.assertEqual(first[0].mpqn, pattern[0][0].mpqn)
+        self.assertEqual((first[1].numerator, first[1].denominator), (6, 8))
+        self.assertIsInstance(sliced[1][-1], Events.EndOfTrackEvent)
+        start = pattern[1].index_at_tick(15 * res)
+        stop = pattern[1].index_at_tick(21 * res)
+        self.assertEqual(sliced[1][:-1].abs_ticks,
+                         tuple(tick - 15 * res for tick in
+                               pattern[1].abs_ticks[start:stop]))
+        # absolute tracks slice the same, rebased to tick 0
+        pattern.relative = False
+        sliced_abs = pattern.slice_bars(5, 7)
+        sliced_abs.relative = True
+        self.assertEqual(sliced_abs, sliced)
+
     def test_mul_pattern(self):
         pattern1 = FileIO.read_midifile('mary.mid')
         pattern1 * 1  # test ints are valid too
@@ -244,13 +1117,54 @@ class TestPattern(unittest.TestCase):
         orig = FileIO.read_midifile('mary.mid')
         orig *= 1.1
         FileIO.write_midifile('test.mid', orig)
+        # the writer converts a copy to the maximum resolution
+        self.assertNotEqual(orig.resolution, MAX_TICK_RESOLUTION)
         orig.resolution = MAX_TICK_RESOLUTION
-        for track in orig:
-            for event in track:
-                event.tick = int(event.tick + .5)
+        orig.quantize()
         read = FileIO.read_midifile('test.mid')
         self.assertEqual(orig, read)
 
+    def test_exact_resolution(self):
+        '''Resolution changes are exact, and quantize without drift'''
+        pattern = FileIO.read_midifile('mary.mid')
+        original = pattern.copy()
+        pattern.resolution = 7
+        self.assertTrue(any(isinstance(tick, Fraction)
+                            for tick in pattern[1].abs_ticks))
+        self.assertFalse(any(isinstance(tick, float)
+                             for tick in pattern[1].abs_ticks))
+        pattern.resolution = original.resolution
+        self.assertEqual(pattern, original)
+        pattern.resolution = 7
+        expected = [int(tick * 7 / original.resolution + Fraction(1, 2))
+                    for tick in original[1].abs_ticks]
+        self.assertEqual(list(pattern.quantize()[1].abs_ticks), expected)
+        self.assertTrue(all(type(event.tick) is int for event in pattern[1]))
+        # the writer quantizes fractional ticks at the pattern's resolution
+        pattern = FileIO.read_midifile('mary.mid')
+        pattern.resolution = 7
+        buf = BytesIO()
+        FileIO.FileWriter().write(buf, pattern)
+        self.assertTrue(any(isinstance(tick, Fraction)
+                            for tick in pattern[1].abs_ticks))
+        read = FileIO.FileReader().read(BytesIO(buf.getvalue()))
+        self.assertEqual(read.resolution, 7)
+        self.assertEqual(list(read[1].abs_ticks), expected)
+        # events held across quantize can still be given fractional values
+        pattern = FileIO.read_midifile('mary.mid')
+        note = pattern[1][5]
+        pattern.resolution = 7
+        pattern.quantize()
+        note.tick = 1.5
+        note.velocity = 63.5
+        buf = BytesIO()
+        FileIO.FileWriter().write(buf, pattern)
+        read = FileIO.FileReader().read(BytesIO(buf.getvalue()))
+        self.assertEqual(read[1][5].tick,
+                         int(Fraction(3 * MAX_TICK_RESOLUTION, 14) +
+                             Fraction(1, 2)))
+        self.assertEqual(read[1][5].velocity, 64)
+
     def test_add_patterns(self):
         pattern = FileIO.read_midifile('mary.mid')
         copy = pattern.copy()
@@ -262,3 +1176,80 @@ class TestPattern(unittest.TestCase):
             for event, eventcopy in zip(track, trackcopy):
                 self.assertEqual(event, eventcopy)
                 self.assertFalse(event is eventcopy)
+
+
+class TestArrays(unittest.TestCase):
+
+    def test_round_trip(self):
+        '''ArrayPatterns round-trip with Patterns and write identical files'''
+        pattern = FileIO.read_midifile('mary.mid')
+        arrays = Arrays.ArrayPattern.from_pattern(pattern)
+        self.assertEqual(arrays, FileIO.read_midifile('mary.mid',
+                                                      columnar=True))
+        self.assertEqual(arrays.to_pattern(), pattern)
+        buf = BytesIO()
+        FileIO.FileWriter().write(buf, arrays)
+        buf.seek(0)
+        self.assertEqual(FileIO.FileReader().read(buf), pattern)
+
+    def test_shared_payload(self):
+        '''Merging into a shared payload only appends to it'''
+        pattern = FileIO.read_midifile('mary.mid')
+        arrays = Arrays.ArrayPattern.from_pattern(pattern)
+        copy = arrays[0].copy()
+        before = bytes(arrays.payload)
+        arrays[0].merge(Arrays.ArrayTrack.from_track(pattern[0]))
+        self.assertIs(copy.payload, arrays.payload)
+        self.assertGreater(len(arrays.payload), len(before))
+        self.assertEqual(arrays.payload[:len(before)], before)
+        self.assertEqual(copy.to_track(), pattern[0])
+
+    def test_operators(self):
+        '''ArrayTracks support the same operators as Tracks'''
+        pattern = FileIO.read_midifile('mary.mid')
+        arrays = Arrays.ArrayPattern.from_pattern(pattern)
+        for op in [lambda x: x + 3, lambda x: x - 2, lambda x: x >> 5,
+                   lambda x: (x >> 5) << 3, lambda x: x * 2,
+                   lambda x: x ** 3, lambda x: x ** 2.5, lambda x: x + x,
+                   lambda x: x.map(lambda e: 127, 'velocity'),
+                   lambda x: x.filter(lambda e: e.status == 0x90),
+                   lambda x: x[2:10]]:
+            # ArrayTracks round fractional ticks
+            self.assertEqual(op(arrays[1]).to_track(),
+                             op(pattern[1]).truncate_ticks())
+        self.assertEqual((arrays + 1).to_pattern(), pattern + 1)
+        self.assertEqual(arrays[1].to_track(relative=False),
+                         pattern[1].make_ticks_abs())
+
+    def test_data_ranges(self):
+        '''Operators clamp data bytes to 0-127 as the writer does for Tracks'''
+        pattern = FileIO.read_midifile('mary.mid')
+        arrays = Arrays.ArrayPattern.from_pattern(pattern)
+        self.assertEqual(arrays[1].data1.typecode, 'B')
+        self.assertEqual((arrays[1] + 36).to_track(), pattern[1] + 36)
+
+        def written(track):
+            buf = BytesIO()
+            FileIO.FileWriter().write(buf, Containers.Pattern(
+                [track], resolution=pattern.resolution))
+            return buf.getvalue()
+
+        for op in [lambda x: x + 100, lambda x: x - 100, lambda x: x >> 100,
+                   lambda x: x >> -100, lambda x: x << 1]:
+            result = op(arrays[1])
+            self.assertLessEqual(max(result.data1 + result.data2), 127)
+            self.assertEqual(written(result.to_track()),
+                             written(op(pattern[1])))
+        with self.assertRaises(ValueError):
+            arrays[1] * 2 ** 60
+        track = Arrays.ArrayTrack.from_track(
+            Containers.Track([Events.NoteOnEvent(pitch=60, velocity=200)]))
+        self.assertEqual(list(track.data2), [127])
+
+    def test_mul_rounds_absolute_ticks(self):
+        '''Scaling rounds absolute ticks, so the length doesn't drift'''
+        track = Arrays.ArrayTrack.from_track(
+            FileIO.read_midifile('mary.mid')[1])
+        self.assertEqual((track * 1.1).length, int(track.length * 1.1 + .5))
+        self.assertEqual(sum((track * 1.1).tick), (track * 1.1).length)
+        self.assertEqual((track * 1.1) / 1.1, track)